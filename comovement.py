@@ -0,0 +1,168 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+class RollingCorrelation:
+    """Rolling-window correlation matrix across many series, maintained with running sums.
+
+    Every appended row adds its pairwise products to the sums and every row leaving the window
+    subtracts them, so appending k rows costs O(k * N^2) instead of recomputing the N x N matrix from
+    the whole window. Missing values are handled pairwise (as in DataFrame.corr): each pair keeps its
+    own count and sums over the rows where both series are present.
+
+    The last `revise_rows` rows taken from a panel are provisional (a partial current bar, or an hour in
+    which a slower series has not printed yet): the next update subtracts them and re-applies their
+    current values. A tracker may be shared across threads; update and correlation are locked.
+    """
+
+    def __init__(self, symbols, window, min_periods=None, rebuild_every=None, revise_rows=1):
+        self.symbols = list(symbols)
+        self.window = window
+        self.min_periods = min_periods or max(3, window // 4)
+        # Sums are recomputed from the buffer after this many evictions to bound floating-point drift
+        self.rebuild_every = rebuild_every or window
+        self.values = np.full((window, len(self.symbols)), np.nan)
+        self.start = 0
+        self.count = 0
+        self.evicted = 0
+        self.revise_rows = revise_rows
+        self.provisional = 0          # trailing rows re-applied on the next update
+        self.committed_time = None    # time of the last row that is no longer revised
+        self.last_time = None
+        self.lock = threading.RLock()
+        self._reset_sums()
+
+    def _reset_sums(self):
+        n = len(self.symbols)
+        self.n = np.zeros((n, n))    # rows where both i and j are present
+        self.sx = np.zeros((n, n))   # sum of x_i over those rows (the sum of x_j is sx.T)
+        self.sxx = np.zeros((n, n))  # sum of x_i^2 over those rows
+        self.sxy = np.zeros((n, n))  # sum of x_i * x_j
+
+    def _accumulate(self, rows, sign):
+        valid = ~np.isnan(rows)
+        x = np.where(valid, rows, 0.0)
+        v = valid.astype(float)
+        self.n += sign * (v.T @ v)
+        self.sx += sign * (x.T @ v)
+        self.sxx += sign * ((x * x).T @ v)
+        self.sxy += sign * (x.T @ x)
+
+    def _window_rows(self):
+        return self.values[(self.start + np.arange(self.count)) % self.window]
+
+    def rebuild(self):
+        """Recomputes the running sums from the rows in the window."""
+        self._reset_sums()
+        self._accumulate(self._window_rows(), 1)
+        self.evicted = 0
+
+    def _retract_provisional(self):
+        """Subtracts the provisional trailing rows so update can re-apply them with their latest values."""
+        if self.provisional:
+            slots = (self.start + self.count - self.provisional + np.arange(self.provisional)) % self.window
+            self._accumulate(self.values[slots], -1)
+            self.values[slots] = np.nan
+            self.count -= self.provisional
+            self.provisional = 0
+            self.last_time = self.committed_time
+
+    def append(self, rows, last_time=None):
+        """Appends rows (k x N, oldest first), evicting the oldest rows beyond the window. Appended rows are final."""
+        self.provisional = 0
+        rows = np.asarray(rows, dtype=float).reshape(-1, len(self.symbols))[-self.window:]
+        overflow = max(0, self.count + len(rows) - self.window)
+        if overflow:
+            evicted = (self.start + np.arange(overflow)) % self.window
+            self._accumulate(self.values[evicted], -1)
+            self.start = (self.start + overflow) % self.window
+            self.count -= overflow
+            self.evicted += overflow
+        slots = (self.start + self.count + np.arange(len(rows))) % self.window
+        self.values[slots] = rows
+        self.count += len(rows)
+        self._accumulate(rows, 1)
+        if self.evicted >= self.rebuild_every:
+            self.rebuild()
+        if last_time is not None:
+            self.last_time = last_time
+
+    def update(self, panel):
+        """Appends the rows of a time-indexed panel (columns: symbols) newer than the last final row; returns the number added.
+
+        The previous update's provisional rows are re-applied from the panel, and the last revise_rows
+        rows of this one become provisional.
+        """
+        with self.lock:
+            self._retract_provisional()
+            panel = panel.reindex(columns=self.symbols)
+            if self.last_time is not None:
+                panel = panel[panel.index > self.last_time]
+            if panel.empty:
+                return 0
+            committed_time = self.last_time
+            self.append(panel.to_numpy(dtype=float), panel.index[-1])
+            self.provisional = min(self.revise_rows, len(panel), self.count)
+            self.committed_time = panel.index[-self.provisional - 1] if len(panel) > self.provisional else committed_time
+            return len(panel)
+
+    def correlation(self):
+        """Pearson correlation over the window as a symbol x symbol DataFrame (NaN below min_periods)."""
+        with self.lock, np.errstate(divide="ignore", invalid="ignore"):
+            mean_x = self.sx / self.n
+            mean_y = mean_x.T
+            cov = self.sxy / self.n - mean_x * mean_y
+            var_x = self.sxx / self.n - mean_x ** 2
+            corr = cov / np.sqrt(var_x * var_x.T)
+        corr = np.clip(corr, -1.0, 1.0)
+        corr[self.n < self.min_periods] = np.nan
+        return pd.DataFrame(corr, index=self.symbols, columns=self.symbols)
+
+
+def updated_correlation(tracker, panel):
+    """Feeds a panel's new rows to a RollingCorrelation and returns its correlation matrix."""
+    with tracker.lock:
+        tracker.update(panel)
+        return tracker.correlation()
+
+
+def top_peers(corr, symbol, k=5):
+    """The k series most positively correlated with symbol (itself and NaN excluded), highest first."""
+    if symbol not in corr.index:
+        return pd.Series(dtype=float)
+    return corr.loc[symbol].drop(symbol).dropna().nlargest(k)
+
+
+def correlation_clusters(corr, min_correlation=0.5):
+    """Average-linkage clusters: groups keep merging while their mean pairwise correlation is at least min_correlation.
+
+    Missing correlations count as 0. Returns a list of clusters (lists of symbols), largest first.
+    """
+    similarity = np.nan_to_num(corr.to_numpy(dtype=float, copy=True), nan=0.0)
+    n = len(similarity)
+    np.fill_diagonal(similarity, -np.inf)
+    sizes = np.ones(n)
+    active = np.ones(n, dtype=bool)
+    members = [[i] for i in range(n)]
+    while active.sum() > 1:
+        masked = np.where(active[:, None] & active[None, :], similarity, -np.inf)
+        i, j = np.unravel_index(np.argmax(masked), masked.shape)
+        if masked[i, j] < min_correlation:
+            break
+        # Lance-Williams update for average linkage: the merged group's similarity is the size-weighted mean
+        merged = (sizes[i] * similarity[i] + sizes[j] * similarity[j]) / (sizes[i] + sizes[j])
+        similarity[i, :] = merged
+        similarity[:, i] = merged
+        similarity[i, i] = -np.inf
+        active[j] = False
+        sizes[i] += sizes[j]
+        members[i] += members[j]
+    clusters = [[corr.index[m] for m in sorted(members[i])] for i in np.flatnonzero(active)]
+    return sorted(clusters, key=len, reverse=True)
+
+
+def format_peers(peers):
+    """'A 0.81 · B 0.77' for a top_peers Series."""
+    return " · ".join(f"{name} {value:.2f}" for name, value in peers.items())
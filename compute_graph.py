@@ -0,0 +1,164 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Bound on memoized node results kept across reruns (least recently used are dropped first)
+MAX_NODE_ENTRIES = 2048
+
+
+class Ref:
+    """A node result: its node name, the digest of its inputs, and the computed value."""
+
+    __slots__ = ("name", "digest", "value")
+
+    def __init__(self, name, digest, value):
+        self.name, self.digest, self.value = name, digest, value
+
+    def __repr__(self):
+        return f"Ref({self.name}, {self.digest[:8]})"
+
+
+def _update_values(h, values):
+    """Feeds a Series' or Index's dtype and values (not its index) into a hash."""
+    h.update(str(values.dtype).encode())
+    raw = values.values  # numpy datetime64 (UTC) even for tz-aware columns
+    if isinstance(raw, np.ndarray) and raw.dtype.kind in "biufcmM":
+        # Numeric and datetime columns hash their raw buffer
+        h.update(np.ascontiguousarray(raw).view(np.uint8).tobytes())
+    else:
+        # Strings, dates and other objects hash their text, which is faster than hash_pandas_object
+        h.update("\x1f".join(map(str, values.tolist())).encode())
+
+
+def _update(h, value):
+    """Feeds a value's content into a hash; Refs contribute their digest instead of their value."""
+    if isinstance(value, Ref):
+        h.update(b"ref:" + value.digest.encode())
+    elif isinstance(value, pd.DataFrame):
+        h.update(b"frame")
+        _update_values(h, value.index)
+        for column in value.columns:
+            _update(h, column)
+            _update_values(h, value[column])
+    elif isinstance(value, pd.Series):
+        h.update(b"series")
+        _update_values(h, value.index)
+        _update_values(h, value)
+    elif isinstance(value, pd.Index):
+        h.update(b"index")
+        _update_values(h, value)
+    elif isinstance(value, np.ndarray):
+        h.update(b"array" + str(value.dtype).encode() + str(value.shape).encode())
+        h.update(np.ascontiguousarray(value).tobytes() if value.dtype != object else repr(value.tolist()).encode())
+    elif isinstance(value, dict):
+        h.update(b"dict")
+        for key in sorted(value, key=repr):
+            _update(h, key)
+            _update(h, value[key])
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        h.update(type(value).__name__.encode())
+        for item in (sorted(value, key=repr) if isinstance(value, (set, frozenset)) else value):
+            _update(h, item)
+    elif value is None or isinstance(value, (bool, int, float, str, bytes, np.generic)) or not hasattr(value, "__dict__"):
+        h.update(type(value).__name__.encode() + b":" + repr(value).encode())
+    elif callable(value) and hasattr(value, "__qualname__"):
+        h.update(b"fn:" + f"{value.__module__}.{value.__qualname__}".encode())
+    else:
+        # Plain objects (screen expressions, percentile indexes) hash by class and attributes
+        h.update(b"obj:" + type(value).__qualname__.encode())
+        _update(h, vars(value))
+    h.update(b";")
+
+
+def content_hash(value):
+    """Returns a hex digest of a value's content (frames, arrays, containers, scalars and plain objects)."""
+    h = hashlib.blake2b(digest_size=16)
+    _update(h, value)
+    return h.hexdigest()
+
+
+def _resolve(value):
+    """Replaces Refs (also inside lists, tuples and dicts) with their values."""
+    if isinstance(value, Ref):
+        return value.value
+    if isinstance(value, dict):
+        return {k: _resolve(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_resolve(v) for v in value)
+    return value
+
+
+class ComputeGraph:
+    """Memoizes named computation nodes by a hash of their inputs and parameters.
+
+    Upstream results are passed on as Refs, so a node's key is built from its dependencies' digests
+    and only nodes downstream of a changed input or parameter are recomputed. Node callables are not
+    hashed: the node name stands for the computation. Memoized values are shared, so callers must not
+    mutate them.
+    """
+
+    def __init__(self, max_entries=MAX_NODE_ENTRIES):
+        self.max_entries = max_entries
+        self.cache = OrderedDict()  # digest -> value
+        self.stats = {}  # name -> {"hits", "misses", "seconds"}
+        self.lock = threading.Lock()
+
+    def _count(self, name, hit, seconds=0.0):
+        stats = self.stats.setdefault(name, {"hits": 0, "misses": 0, "seconds": 0.0})
+        stats["hits" if hit else "misses"] += 1
+        stats["seconds"] += seconds
+
+    def source(self, name, value):
+        """Wraps an external input (e.g. downloaded bars) in a Ref keyed by its content."""
+        return Ref(name, content_hash((name, value)), value)
+
+    def node(self, name, fn, *args, **params):
+        """Returns fn(*args, **params) as a Ref, computing it only when no result is memoized for these inputs."""
+        digest = content_hash((name, args, params))
+        with self.lock:
+            if digest in self.cache:
+                self.cache.move_to_end(digest)
+                self._count(name, True)
+                return Ref(name, digest, self.cache[digest])
+
+        started = time.perf_counter()
+        value = fn(*_resolve(args), **_resolve(params))
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.cache[digest] = value
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+            self._count(name, False, elapsed)
+        return Ref(name, digest, value)
+
+    def node_stats(self):
+        """Hit/miss counts, hit rate and compute seconds per node name."""
+        with self.lock:
+            stats = pd.DataFrame.from_dict(self.stats, orient="index", columns=["hits", "misses", "seconds"])
+        stats.index.name = "node"
+        stats["hit_rate"] = stats["hits"] / (stats["hits"] + stats["misses"]).where(lambda total: total > 0)
+        return stats.sort_index()
+
+    def clear(self):
+        """Drops memoized results and stats."""
+        with self.lock:
+            self.cache.clear()
+            self.stats.clear()
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_compute_graph():
+    """Returns the process-wide computation graph, shared by dashboard reruns and sessions."""
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = ComputeGraph()
+    return _graph
@@ -1,6 +1,13 @@
+import os
 import streamlit as st
 import pandas as pd
-from supabase_client import get_supabase_client
+from supabase_client import get_shared_supabase_client
+import postgres_client
+from fetch_scheduler import get_scheduler
+from percentile_sweep import SortedPercentiles
+from screener import F, all_of, any_of, parse_screen, evaluate_screen
+from compute_graph import get_compute_graph
+from comovement import RollingCorrelation, updated_correlation, top_peers, correlation_clusters, format_peers
 import logging
 import numpy as np # Import numpy for percentile calculation
 
@@ -29,9 +36,33 @@ TARGET_ASSETS = [
     "NIKKEI STOCK AVERAGE - CHICAGO MERCANTILE EXCHANGE"
 ]
 
+# Use the cot_asset_thresholds() RPC (migrations/001_cot_analytics.sql) by default instead of client-side thresholds
+USE_DB_ANALYTICS = os.environ.get("COT_USE_DB_ANALYTICS", "false").lower() in ("1", "true", "yes")
+
 # Define trader categories
 TRADER_CATEGORIES = ["noncomm", "comm", "nonrept"]
 
+# Default percentile of historical changes used as the significance threshold
+COT_PERCENTILE = 40
+
+# Sidebar filters: (label, trader category, direction)
+COT_FILTERS = [
+    ("Non-Commercial Significant Net Long Change", "noncomm", "long"),
+    ("Non-Commercial Significant Net Short Change", "noncomm", "short"),
+    ("Commercial Significant Net Long Change", "comm", "long"),
+    ("Commercial Significant Net Short Change", "comm", "short"),
+    ("Non-Reportable Significant Net Long Change", "nonrept", "long"),
+    ("Non-Reportable Significant Net Short Change", "nonrept", "short"),
+]
+
+# Weekly reports in the co-movement window, and the average correlation that groups assets into a cluster
+COT_CORRELATION_REPORTS = 52
+COT_CLUSTER_CORRELATION = 0.5
+COT_CATEGORY_LABELS = {"noncomm": "Non-Commercial", "comm": "Commercial", "nonrept": "Non-Reportable"}
+
+# Columns of the screener feature matrix
+COT_FEATURES = ["has_recent_reports"] + [f"{category}_{feature}" for category in TRADER_CATEGORIES for feature in ("change", "pos_threshold", "neg_threshold")]
+
 # Mapping of asset names to TradingView URLs
 TRADINGVIEW_URLS = {
     "GOLD - COMMODITY EXCHANGE INC.": "https://www.tradingview.com/chart/jMGev8A9/?symbol=OANDA%3AXAUUSD",
@@ -57,14 +88,33 @@ TRADINGVIEW_URLS = {
 
 # --- Helper Functions ---
 
+def query_cot_reports(supabase_client, asset_name, limit):
+    """Runs the Supabase query for the latest `limit` COT reports of an asset (retried and rate limited by the fetch scheduler)."""
+    response = supabase_client.table("cot_reports").select("*").eq("market_and_exchange_names", asset_name).order("report_date", desc=True).limit(limit).execute()
+    return response.data
+
+def prefetch_cot_reports(supabase_client, asset_names, limit):
+    """Fetches COT reports for many assets concurrently through the shared client.
+
+    Only called from st.cache_* loaders, on a cache miss: stale scheduler entries are refetched rather than
+    served, so the loader's own TTL is the only staleness.
+    """
+    if postgres_client.use_postgres_backend():
+        return
+    get_scheduler().fetch_many("supabase", {f"cot_reports:{asset_name}:{limit}": (query_cot_reports, (supabase_client, asset_name, limit)) for asset_name in asset_names}, fresh=True)
+
 @st.cache_data(ttl=3600) # Cache data for 1 hour to avoid re-fetching frequently
 def fetch_historical_reports(_supabase_client, asset_name, limit=52):
     """Fetches historical COT reports for a given asset from Supabase."""
     logging.info(f"Attempting to fetch last {limit} reports for asset: {asset_name} for historical analysis.")
     try:
+        if postgres_client.use_postgres_backend():
+            fetched_data = postgres_client.fetch_cot_reports(asset_name, limit=limit)
+            logging.info(f"Successfully fetched {len(fetched_data)} historical records for {asset_name} from Postgres.")
+            return fetched_data
+
         # Use the _supabase_client parameter
-        response = _supabase_client.table("cot_reports").select("*").eq("market_and_exchange_names", asset_name).order("report_date", desc=True).limit(limit).execute()
-        fetched_data = response.data
+        fetched_data = get_scheduler().fetch("supabase", f"cot_reports:{asset_name}:{limit}", query_cot_reports, _supabase_client, asset_name, limit)
 
         if fetched_data is not None and isinstance(fetched_data, list):
              logging.info(f"Successfully fetched {len(fetched_data)} historical records for {asset_name}.")
@@ -78,14 +128,17 @@ def fetch_historical_reports(_supabase_client, asset_name, limit=52):
         # Don't show error on every historical fetch, just log it.
         return None # Indicate a fetch error
 
-@st.cache_data(ttl=300) # Cache latest reports for 5 minutes
 def fetch_latest_two_reports(_supabase_client, asset_name):
     """Fetches the latest two COT reports for a given asset from Supabase."""
     logging.info(f"Attempting to fetch latest two reports for asset: {asset_name} for current analysis.")
     try:
+        if postgres_client.use_postgres_backend():
+            fetched_data = postgres_client.fetch_cot_reports(asset_name, limit=2)
+            logging.info(f"Successfully fetched latest reports for {asset_name} from Postgres. Received {len(fetched_data)} records.")
+            return fetched_data
+
         # Use the _supabase_client parameter
-        response = _supabase_client.table("cot_reports").select("*").eq("market_and_exchange_names", asset_name).order("report_date", desc=True).limit(2).execute()
-        fetched_data = response.data
+        fetched_data = get_scheduler().fetch("supabase", f"cot_reports:{asset_name}:2", query_cot_reports, _supabase_client, asset_name, 2)
 
         if fetched_data is not None and isinstance(fetched_data, list):
              logging.info(f"Successfully fetched latest reports for {asset_name}. Received {len(fetched_data)} records.")
@@ -96,9 +149,51 @@ def fetch_latest_two_reports(_supabase_client, asset_name):
 
     except Exception as e:
         logging.exception(f"Exception occurred while fetching latest reports for {asset_name}: {e}")
-        st.error(f"Fetch: There was an error fetching latest data for {asset_name}. Details: {e}")
         return None # Return None to indicate a fetch error
 
+@st.cache_data(ttl=300) # Compact analytics rows change only when new reports land
+def fetch_compact_cot_analytics(_supabase_client, asset_names, limit=52, percentile=0.4):
+    """Fetches one row per asset with latest net ratio changes and percentile thresholds computed in the database."""
+    logging.info(f"Attempting to fetch compact COT analytics for {len(asset_names)} assets.")
+    try:
+        if postgres_client.use_postgres_backend():
+            fetched_data = postgres_client.fetch_cot_thresholds(list(asset_names), limit=limit, percentile=percentile)
+        else:
+            response = _supabase_client.rpc("cot_asset_thresholds", {"p_assets": list(asset_names), "p_limit": limit, "p_percentile": percentile}).execute()
+            fetched_data = response.data
+
+        if fetched_data is not None and isinstance(fetched_data, list):
+             logging.info(f"Successfully fetched compact COT analytics. Received {len(fetched_data)} rows.")
+             return fetched_data
+        else:
+             logging.warning(f"Compact COT analytics fetch returned unexpected data. Received type: {type(fetched_data)}.")
+             return None
+
+    except Exception as e:
+        logging.exception(f"Exception occurred while fetching compact COT analytics: {e}")
+        return None
+
+
+def parse_compact_cot_analytics(rows):
+    """Splits compact analytics rows into the thresholds and latest-changes dictionaries used by the app."""
+    asset_group_direction_thresholds = {asset_name: {category: {'positive': 0, 'negative': 0} for category in TRADER_CATEGORIES} for asset_name in TARGET_ASSETS}
+    latest_changes_by_asset = {}
+
+    for row in rows:
+        asset_name = row.get("market_and_exchange_names")
+        asset_group_direction_thresholds[asset_name] = {
+            category: {
+                'positive': row.get(f"{category}_positive_threshold") or 0,
+                'negative': row.get(f"{category}_negative_threshold") or 0,
+            }
+            for category in TRADER_CATEGORIES
+        }
+        # A NULL latest change means fewer than two reports for the asset
+        if all(row.get(f"{category}_net_ratio_change") is not None for category in TRADER_CATEGORIES):
+            latest_changes_by_asset[asset_name] = {f"{category}_net_ratio_change": row[f"{category}_net_ratio_change"] for category in TRADER_CATEGORIES}
+
+    return asset_group_direction_thresholds, latest_changes_by_asset
+
 
 def calculate_net_position_ratio(long, short):
     """Calculates the ratio (Long - Short) / (Long + Short), handling division by zero."""
@@ -163,61 +258,156 @@ def calculate_latest_net_ratio_changes(reports):
 
     return changes
 
-# --- Streamlit App ---
-def main():
-    st.title("Commitment of Traders (COT) Analysis")
-    logging.info("Streamlit app started.")
+@st.cache_resource(ttl=3600, show_spinner=False) # Sorted once per data refresh; percentile changes only do index lookups
+def build_cot_change_percentiles(_supabase_client, limit=52):
+    """Sorts each asset's historical net ratio changes once per (category, direction) for percentile lookups.
 
-    # Initialize Supabase client
-    logging.info("Initializing Supabase client.")
-    supabase_client = get_supabase_client()
-    if not supabase_client:
-        st.error("Failed to initialize Supabase client.")
-        logging.error("Supabase client initialization failed.")
-        return
-    logging.info("Supabase client initialized successfully.")
+    Keys are (asset, category, 'positive'|'negative'); negative changes are stored as absolute values.
+    """
+    logging.info(f"Sorting historical net ratio changes from the last {limit} reports for percentile lookups...")
+    index = SortedPercentiles()
+    prefetch_cot_reports(_supabase_client, TARGET_ASSETS, limit)
 
-    # --- Calculate Individual Asset and Group Thresholds (40th percentile) ---
-    logging.info("Calculating individual asset and group net change thresholds (40th percentile)...")
+    for asset_name in TARGET_ASSETS:
+        historical_reports = fetch_historical_reports(_supabase_client, asset_name, limit=limit)
+        if not historical_reports or len(historical_reports) < 2:
+            logging.warning(f"Not enough historical reports found for {asset_name} to calculate thresholds for all groups and directions.")
+            continue
+
+        historical_changes_by_group = calculate_historical_net_ratio_changes_by_group(historical_reports)
+        for category in TRADER_CATEGORIES:
+            index.add((asset_name, category, 'positive'), historical_changes_by_group[category]['positive'])
+            index.add((asset_name, category, 'negative'), np.abs(historical_changes_by_group[category]['negative']))
+
+    return index
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def build_cot_change_panels(_supabase_client, limit=52):
+    """Net ratio change per report date (rows, oldest first) and asset (columns), one frame per trader category."""
+    prefetch_cot_reports(_supabase_client, TARGET_ASSETS, limit)
+    changes = {category: {} for category in TRADER_CATEGORIES}
+    for asset_name in TARGET_ASSETS:
+        reports = fetch_historical_reports(_supabase_client, asset_name, limit=limit)
+        if not reports or len(reports) < 2:
+            continue
+        # Reports are ordered descending by date; each change is dated by the more recent report
+        dates = pd.to_datetime([report.get("report_date") for report in reports[:-1]])
+        for category in TRADER_CATEGORIES:
+            ratios = np.array([calculate_net_position_ratio(report.get(f"{category}_positions_long_all", 0), report.get(f"{category}_positions_short_all", 0)) for report in reports])
+            changes[category][asset_name] = pd.Series(ratios[:-1] - ratios[1:], index=dates)
+    return {category: pd.DataFrame(series, columns=TARGET_ASSETS).sort_index() for category, series in changes.items()}
+
+@st.cache_resource(show_spinner=False)
+def get_cot_correlation(category):
+    """Running-sum correlation tracker of one trader category's weekly changes, kept across reruns."""
+    return RollingCorrelation(TARGET_ASSETS, COT_CORRELATION_REPORTS, min_periods=8)
+
+def calculate_asset_thresholds(supabase_client, percentile=COT_PERCENTILE):
+    """Looks up net change thresholds per asset, trader group and direction at the given percentile of the last 52 reports."""
+    logging.info(f"Calculating individual asset and group net change thresholds ({percentile}th percentile)...")
+    return thresholds_from_percentiles(build_cot_change_percentiles(supabase_client), percentile)
+
+def thresholds_from_percentiles(index, percentile=COT_PERCENTILE):
+    """Builds the asset -> group -> direction threshold dictionary from a build_cot_change_percentiles index."""
     # Nested dictionary to store thresholds per asset, group, and direction (positive/negative)
     asset_group_direction_thresholds = {}
 
     for asset_name in TARGET_ASSETS:
-        asset_group_direction_thresholds[asset_name] = {} # Initialize nested dictionary for the asset
-        historical_reports = fetch_historical_reports(supabase_client, asset_name, limit=52)
-
-        if historical_reports and len(historical_reports) >= 2:
-            historical_changes_by_group = calculate_historical_net_ratio_changes_by_group(historical_reports)
-
-            for category in TRADER_CATEGORIES:
-                 asset_group_direction_thresholds[asset_name][category] = {} # Initialize direction dictionary
-                 positive_changes = historical_changes_by_group.get(category, {}).get('positive', [])
-                 negative_changes = historical_changes_by_group.get(category, {}).get('negative', [])
-
-                 # Calculate 40th percentile for positive changes
-                 if positive_changes:
-                     positive_threshold = np.percentile(positive_changes, 40)
-                     asset_group_direction_thresholds[asset_name][category]['positive'] = positive_threshold
-                     logging.info(f"Calculated 40th percentile positive threshold for {asset_name} - {category}: {positive_threshold:.6f}")
-                 else:
-                     asset_group_direction_thresholds[asset_name][category]['positive'] = 0 # Set threshold to 0 if no historical positive changes
-                     logging.warning(f"No historical positive net changes found for {asset_name} - {category} to calculate threshold.")
-
-                 # Calculate 40th percentile for absolute negative changes
-                 if negative_changes:
-                     # Calculate percentile on absolute values, but store as positive threshold
-                     negative_threshold = np.percentile([abs(change) for change in negative_changes], 40)
-                     asset_group_direction_thresholds[asset_name][category]['negative'] = negative_threshold
-                     logging.info(f"Calculated 40th percentile negative threshold for {asset_name} - {category}: {negative_threshold:.6f}")
-                 else:
-                     asset_group_direction_thresholds[asset_name][category]['negative'] = 0 # Set threshold to 0 if no historical negative changes
-                     logging.warning(f"No historical negative net changes found for {asset_name} - {category} to calculate threshold.")
+        asset_group_direction_thresholds[asset_name] = {}
+        for category in TRADER_CATEGORIES:
+            # Threshold is 0 when there are no historical changes in that direction
+            asset_group_direction_thresholds[asset_name][category] = {
+                direction: index.percentile((asset_name, category, direction), percentile, default=0)
+                for direction in ('positive', 'negative')
+            }
+            logging.debug(f"Thresholds for {asset_name} - {category}: {asset_group_direction_thresholds[asset_name][category]}")
+
+    return asset_group_direction_thresholds
+
+@st.cache_data(ttl=300, show_spinner=False) # Cache latest reports for 5 minutes; reruns within that do no fetching at all
+def fetch_all_latest_reports(_supabase_client):
+    """Fetches the latest two reports of every target asset (None for an asset whose fetch failed)."""
+    prefetch_cot_reports(_supabase_client, TARGET_ASSETS, 2)
+    return {asset_name: fetch_latest_two_reports(_supabase_client, asset_name) for asset_name in TARGET_ASSETS}
+
+def fetch_latest_changes(supabase_client, failures=None):
+    """Fetches the latest two reports per asset and returns their net ratio changes, keyed by asset (assets without two reports are omitted).
+
+    When a `failures` dict is given, each omitted asset is recorded in it with the reason.
+    """
+    latest_changes_by_asset = {}
+    for asset_name, reports in fetch_all_latest_reports(supabase_client).items():
+        if reports is not None and len(reports) >= 2:
+            latest_changes_by_asset[asset_name] = calculate_latest_net_ratio_changes(reports)
+            logging.debug(f"Latest calculated changes for {asset_name}: {latest_changes_by_asset[asset_name]}")
+        elif failures is not None:
+            failures[asset_name] = "fetch failed" if reports is None else f"{len(reports)} recent reports, need 2"
+    return latest_changes_by_asset
+
+def build_cot_feature_matrix(latest_changes_by_asset, asset_group_direction_thresholds):
+    """Builds the asset x feature matrix (latest change and thresholds per trader group) evaluated by the screener."""
+    rows = {}
+    for asset_name in TARGET_ASSETS:
+        latest_changes = latest_changes_by_asset.get(asset_name)
+        group_direction_thresholds = asset_group_direction_thresholds.get(asset_name, {})
+        row = {"has_recent_reports": 1.0 if latest_changes else 0.0}
+        for category in TRADER_CATEGORIES:
+            row[f"{category}_change"] = latest_changes.get(f"{category}_net_ratio_change", 0) if latest_changes else np.nan
+            row[f"{category}_pos_threshold"] = group_direction_thresholds.get(category, {}).get('positive', 0)
+            row[f"{category}_neg_threshold"] = group_direction_thresholds.get(category, {}).get('negative', 0)
+        rows[asset_name] = row
+    return pd.DataFrame.from_dict(rows, orient="index", columns=COT_FEATURES)
+
+def cot_significant_change(category, direction):
+    """Screen condition: the latest change is beyond the group's positive (long) or negative (short) threshold, and that threshold is non-zero."""
+    if direction == "long":
+        threshold = F(f"{category}_pos_threshold")
+        return (F(f"{category}_change") > threshold) & (threshold > 0)
+    threshold = F(f"{category}_neg_threshold")
+    return (F(f"{category}_change") < -threshold) & (threshold > 0)
+
+# --- Streamlit App ---
+def main():
+    st.title("Commitment of Traders (COT) Analysis")
+    logging.info("Streamlit app started.")
 
+    # Initialize Supabase client (not needed when reads go directly to Postgres)
+    supabase_client = None
+    if postgres_client.use_postgres_backend():
+        logging.info("Using direct Postgres backend for COT reads.")
+    else:
+        # Created once per process; later reruns reuse its pooled keep-alive connections
+        logging.info("Getting shared Supabase client.")
+        supabase_client = get_shared_supabase_client()
+        if not supabase_client:
+            st.error("Failed to initialize Supabase client.")
+            logging.error("Supabase client initialization failed.")
+            return
+        logging.info("Supabase client initialized successfully.")
+
+    # Node results are memoized by input content across reruns: flipping a filter only re-evaluates the screen
+    graph = get_compute_graph()
+
+    # --- Thresholds and latest changes: in-database compact rows or client-side calculation ---
+    st.sidebar.header("Data Source")
+    use_db_analytics = st.sidebar.checkbox("Use in-database COT analytics (compact rows)", value=USE_DB_ANALYTICS)
+    threshold_percentile = st.sidebar.slider("Threshold percentile", min_value=1, max_value=99, value=COT_PERCENTILE,
+                                             help="Percentile of each asset's historical changes that counts as significant. Client-side lookups are instant; the in-database option re-queries.")
+    latest_changes_by_asset = {}
+    if use_db_analytics:
+        compact_rows = fetch_compact_cot_analytics(supabase_client, tuple(TARGET_ASSETS), percentile=threshold_percentile / 100)
+        if compact_rows is None:
+            st.sidebar.warning("In-database analytics unavailable (is migrations/001_cot_analytics.sql applied?). Falling back to client-side calculation.")
+            use_db_analytics = False
         else:
-            # Set thresholds to 0 for all groups and directions if not enough historical reports for the asset
-            for category in TRADER_CATEGORIES:
-                asset_group_direction_thresholds[asset_name][category] = {'positive': 0, 'negative': 0}
-            logging.warning(f"Not enough historical reports found for {asset_name} to calculate thresholds for all groups and directions.")
+            compact_analytics = graph.node("cot_compact_analytics", parse_compact_cot_analytics, graph.source("cot_compact_rows", compact_rows))
+            asset_group_direction_thresholds, latest_changes_by_asset = compact_analytics.value
+            thresholds_node = graph.source("cot_thresholds", asset_group_direction_thresholds)
+
+    if not use_db_analytics:
+        percentiles = graph.source("cot_change_percentiles", build_cot_change_percentiles(supabase_client))
+        thresholds_node = graph.node("cot_thresholds", thresholds_from_percentiles, percentiles, threshold_percentile)
+        asset_group_direction_thresholds = thresholds_node.value
 
     # Display a message about threshold calculation in sidebar
     st.sidebar.header("Filtering Thresholds")
@@ -231,125 +421,84 @@ def main():
             break
 
     if has_any_threshold:
-         st.sidebar.info("Thresholds are calculated individually for each asset, trader group, and direction (positive/negative) based on their last 52 reports (40th percentile).")
+         st.sidebar.info(f"Thresholds are calculated individually for each asset, trader group, and direction (positive/negative) based on their last 52 reports ({threshold_percentile}th percentile).")
     else:
          st.sidebar.warning("Could not calculate thresholds for any asset/group/direction combination. Filtering is disabled.")
 
 
     # --- Filtering Options ---
-    st.sidebar.header("Filter Assets by Significant Change (AND logic)")
-    filter_noncomm_long = st.sidebar.checkbox("Non-Commercial Significant Net Long Change")
-    filter_noncomm_short = st.sidebar.checkbox("Non-Commercial Significant Net Short Change")
-    filter_comm_long = st.sidebar.checkbox("Commercial Significant Net Long Change")
-    filter_comm_short = st.sidebar.checkbox("Commercial Significant Net Short Change")
-    filter_nonrept_long = st.sidebar.checkbox("Non-Reportable Significant Net Long Change")
-    filter_nonrept_short = st.sidebar.checkbox("Non-Reportable Significant Net Short Change")
-
+    st.sidebar.header("Filter Assets by Significant Change")
+    combine_with = st.sidebar.radio("Combine selected filters with", ["AND", "OR"], horizontal=True)
+    selected_filters = [
+        cot_significant_change(category, direction)
+        for label, category, direction in COT_FILTERS
+        if st.sidebar.checkbox(label)
+    ]
+    custom_screen = st.sidebar.text_input(
+        "Custom screen (optional, AND-ed with the above)",
+        placeholder="noncomm_change > noncomm_pos_threshold and not comm_change < 0",
+        help="Features: " + ", ".join(COT_FEATURES) + ". Combine with and / or / not."
+    )
+
+    # --- Evaluate the screen over the whole asset x feature matrix ---
+    if not use_db_analytics:
+        latest_fetch_failures = {}
+        latest_changes_by_asset = fetch_latest_changes(supabase_client, latest_fetch_failures)
+        for asset_name, reason in latest_fetch_failures.items():
+            if reason == "fetch failed":
+                st.error(f"Fetch: There was an error fetching latest data for {asset_name}.")
+    matrix_node = graph.node("cot_feature_matrix", build_cot_feature_matrix, graph.source("cot_latest_changes", latest_changes_by_asset), thresholds_node)
+    feature_matrix = matrix_node.value
+
+    combined_filters = all_of(selected_filters) if combine_with == "AND" else any_of(selected_filters)
+    screen_parts = [F("has_recent_reports") > 0] + ([combined_filters] if combined_filters is not None else [])
+    if custom_screen.strip():
+        try:
+            screen_parts.append(parse_screen(custom_screen))
+        except ValueError as e:
+            st.sidebar.error(f"Ignoring custom screen: {e}")
+    any_filter_active = len(screen_parts) > 1
+    try:
+        passing = graph.node("cot_screen", evaluate_screen, matrix_node, all_of(screen_parts)).value
+    except KeyError as e:
+        st.sidebar.error(f"Ignoring custom screen: {e}")
+        passing = graph.node("cot_screen", evaluate_screen, matrix_node, all_of(screen_parts[:2])).value
+        any_filter_active = combined_filters is not None
+    logging.info(f"{int(passing.sum())} of {len(passing)} assets passed the screen.")
+
+    # --- Co-movement of weekly net ratio changes; only reports newer than the tracker's last one are added ---
+    st.sidebar.header("Co-movement")
+    correlation_category = st.sidebar.selectbox("Trader group", TRADER_CATEGORIES, format_func=lambda category: COT_CATEGORY_LABELS[category])
+    change_panel = graph.source("cot_change_panel", build_cot_change_panels(supabase_client, limit=COT_CORRELATION_REPORTS)[correlation_category])
+    cot_corr = graph.node("cot_correlation", lambda panel, category: updated_correlation(get_cot_correlation(category), panel), change_panel, category=correlation_category).value
+    cot_clusters = graph.node("cot_clusters", correlation_clusters, cot_corr, COT_CLUSTER_CORRELATION).value
+    with st.sidebar.expander(f"Co-movement clusters ({COT_CATEGORY_LABELS[correlation_category]}, {COT_CORRELATION_REPORTS}w)"):
+        for cluster in [c for c in cot_clusters if len(c) > 1]:
+            st.write(" · ".join(cluster))
+
+    with st.sidebar.expander("Computation cache"):
+        st.dataframe(graph.node_stats().round(3))
 
     # --- Display Analysis for Filtered Assets ---
-    
-
     displayed_assets_count = 0
 
-    # Iterate over each target asset and display its analysis
-    for asset_name in TARGET_ASSETS:
-        logging.info(f"Processing analysis for {asset_name}")
-
-        # Get the individual group and direction thresholds for this asset
-        group_direction_thresholds = asset_group_direction_thresholds.get(asset_name, {})
-
-        # Fetch the latest two reports for the asset (for current analysis)
-        reports = fetch_latest_two_reports(supabase_client, asset_name)
-
-        # Calculate latest net ratio changes
-        latest_changes = None
-        if reports is not None and len(reports) >= 2:
-             latest_changes = calculate_latest_net_ratio_changes(reports)
-             logging.debug(f"Latest calculated changes for {asset_name}: {latest_changes}")
-
-        # Determine if the asset should be displayed based on filters and latest changes (AND logic)
-        display_asset = False
-
-        # Check if any filter is active
-        any_filter_active = filter_noncomm_long or filter_noncomm_short or \
-                            filter_comm_long or filter_comm_short or \
-                            filter_nonrept_long or filter_nonrept_short
-
-        # If no filters are active, display all assets with sufficient recent data
-        if not any_filter_active:
-             if reports is not None and len(reports) >= 2:
-                  display_asset = True
-                  logging.info(f"No filters active, displaying {asset_name}.")
-        # If filters are active, apply AND logic
-        elif latest_changes and group_direction_thresholds: # Proceed only if latest changes available and thresholds exist for this asset
-             noncomm_change = latest_changes.get('noncomm_net_ratio_change', 0)
-             comm_change = latest_changes.get('comm_net_ratio_change', 0)
-             nonrept_change = latest_changes.get('nonrept_net_ratio_change', 0)
-
-             # Get group and direction-specific thresholds
-             noncomm_pos_threshold = group_direction_thresholds.get('noncomm', {}).get('positive', 0)
-             noncomm_neg_threshold = group_direction_thresholds.get('noncomm', {}).get('negative', 0)
-             comm_pos_threshold = group_direction_thresholds.get('comm', {}).get('positive', 0)
-             comm_neg_threshold = group_direction_thresholds.get('comm', {}).get('negative', 0)
-             nonrept_pos_threshold = group_direction_thresholds.get('nonrept', {}).get('positive', 0)
-             nonrept_neg_threshold = group_direction_thresholds.get('nonrept', {}).get('negative', 0)
-
-
-             # Assume the asset passes all selected filters initially
-             passes_all_selected_filters = True
-
-             # Check each filter individually if it's active, and apply AND logic
-             if filter_noncomm_long:
-                 # Criteria: Non-Commercial net change is positive AND greater than its positive threshold
-                 if not (noncomm_change > noncomm_pos_threshold and noncomm_pos_threshold > 0):
-                     passes_all_selected_filters = False
-             if filter_noncomm_short:
-                 # Criteria: Non-Commercial net change is negative AND less than negative of its negative threshold
-                 if not (noncomm_change < -noncomm_neg_threshold and noncomm_neg_threshold > 0):
-                     passes_all_selected_filters = False
-             if filter_comm_long:
-                 # Criteria: Commercial net change is positive AND greater than its positive threshold
-                 if not (comm_change > comm_pos_threshold and comm_pos_threshold > 0):
-                     passes_all_selected_filters = False
-             if filter_comm_short:
-                 # Criteria: Commercial net change is negative AND less than negative of its negative threshold
-                 if not (comm_change < -comm_neg_threshold and comm_neg_threshold > 0):
-                     passes_all_selected_filters = False
-             if filter_nonrept_long:
-                 # Criteria: Non-Reportable net change is positive AND greater than its positive threshold
-                 if not (nonrept_change > nonrept_pos_threshold and nonrept_pos_threshold > 0):
-                     passes_all_selected_filters = False
-             if filter_nonrept_short:
-                 # Criteria: Non-Reportable net change is negative AND less than negative of its negative threshold
-                 if not (nonrept_change < -nonrept_neg_threshold and nonrept_neg_threshold > 0):
-                     passes_all_selected_filters = False
-
-             # If the asset passed all selected filters, mark it for display
-             if passes_all_selected_filters:
-                  display_asset = True
-                  logging.info(f"{asset_name} passed all active filters.")
-             else:
-                  logging.info(f"{asset_name} did not pass all active filters.")
-
-        else: # Handle cases where filters are active but latest_changes not available or no valid thresholds
-             logging.info(f"Skipping filtering for {asset_name} due to missing data or thresholds.")
-             pass # Asset will not be displayed as display_asset is still False
-
-
-        # Display the analysis if the asset should be displayed and latest changes are available
-        if display_asset and latest_changes:
-            displayed_assets_count += 1
-            st.subheader(asset_name)
-            st.write(f"**Non-Commercial Ratio Change:** {latest_changes['noncomm_net_ratio_change'] * 100:.2f}%")
-            st.write(f"**Commercial Ratio Change:** {latest_changes['comm_net_ratio_change'] * 100:.2f}%")
-            st.write(f"**Non-Reportable Ratio Change:** {latest_changes['nonrept_net_ratio_change'] * 100:.2f}%")
-            # Optional: Display the individual asset's and group's thresholds here for reference
-            
-            # Add TradingView link
-            tradingview_url = TRADINGVIEW_URLS.get(asset_name)
-            if tradingview_url:
-                 st.markdown(f"[View on TradingView]({tradingview_url})")
-            st.markdown("---") # Add a separator
+    for asset_name in feature_matrix.index[passing.to_numpy()]:
+        latest_changes = latest_changes_by_asset[asset_name]
+        displayed_assets_count += 1
+        st.subheader(asset_name)
+        st.write(f"**Non-Commercial Ratio Change:** {latest_changes['noncomm_net_ratio_change'] * 100:.2f}%")
+        st.write(f"**Commercial Ratio Change:** {latest_changes['comm_net_ratio_change'] * 100:.2f}%")
+        st.write(f"**Non-Reportable Ratio Change:** {latest_changes['nonrept_net_ratio_change'] * 100:.2f}%")
+        # Optional: Display the individual asset's and group's thresholds here for reference
+        peers = top_peers(cot_corr, asset_name, k=3)
+        if not peers.empty:
+            st.caption(f"Co-moving assets ({COT_CATEGORY_LABELS[correlation_category]}): {format_peers(peers)}")
+
+        # Add TradingView link
+        tradingview_url = TRADINGVIEW_URLS.get(asset_name)
+        if tradingview_url:
+             st.markdown(f"[View on TradingView]({tradingview_url})")
+        st.markdown("---") # Add a separator
 
 
     if displayed_assets_count == 0 and any_filter_active:
@@ -0,0 +1,271 @@
+import os
+import time
+import random
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+
+from dotenv import load_dotenv
+
+# Budget overrides (YAHOO_*, SUPABASE_RATE / _BURST / _MAX_CONCURRENCY) may be set in .env
+load_dotenv()
+
+
+@dataclass
+class SourceBudget:
+    """Rate, concurrency and retry settings for one upstream data source."""
+    rate: float                 # sustained requests per second
+    burst: int                  # token bucket capacity
+    max_concurrency: int        # requests in flight at once
+    max_retries: int = 3
+    backoff_base: float = 1.0   # seconds, doubled per retry
+    backoff_max: float = 30.0
+    hedge_after: float = None   # seconds before a duplicate request is sent (None disables hedging)
+    max_hedges: int = 1         # hedged requests in flight at once, on top of max_concurrency
+    ttl: float = 300.0          # seconds a cached result counts as fresh
+
+
+DEFAULT_BUDGETS = {
+    # Yahoo throttles bursts of history calls; hedge slow responses instead of waiting out a 60s timeout
+    "yahoo": SourceBudget(
+        rate=float(os.environ.get("YAHOO_RATE", 2.0)),
+        burst=int(os.environ.get("YAHOO_BURST", 4)),
+        max_concurrency=int(os.environ.get("YAHOO_MAX_CONCURRENCY", 4)),
+        hedge_after=float(os.environ.get("YAHOO_HEDGE_AFTER", 15.0)),
+        max_hedges=int(os.environ.get("YAHOO_MAX_HEDGES", 2)),
+        ttl=900.0,
+    ),
+    "supabase": SourceBudget(
+        rate=float(os.environ.get("SUPABASE_RATE", 20.0)),
+        burst=int(os.environ.get("SUPABASE_BURST", 20)),
+        max_concurrency=int(os.environ.get("SUPABASE_MAX_CONCURRENCY", 6)),
+        backoff_base=0.5,
+        ttl=300.0,
+    ),
+}
+
+# Bound on cached results kept for stale-while-revalidate fallback
+MAX_CACHE_ENTRIES = 512
+
+
+class ThrottledError(Exception):
+    """Raised by fetch functions when the provider signals rate limiting."""
+
+
+def is_throttle_error(error):
+    """Returns True when an exception looks like provider throttling (HTTP 429)."""
+    if isinstance(error, ThrottledError):
+        return True
+    status = getattr(getattr(error, "response", None), "status_code", None) or getattr(error, "status_code", None)
+    if status == 429:
+        return True
+    message = str(error)
+    return "429" in message or "Too Many Requests" in message
+
+
+class TokenBucket:
+    """Thread-safe token bucket whose refill rate backs off on throttling and recovers on success."""
+
+    def __init__(self, rate, capacity):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Blocks until one token is available and takes it."""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+    def throttled(self):
+        """Halves the refill rate (down to 5% of the base rate) after a throttling response."""
+        with self.lock:
+            self.rate = max(self.base_rate * 0.05, self.rate * 0.5)
+            self.tokens = 0.0
+            logging.warning(f"Throttling detected, rate reduced to {self.rate:.2f} req/s.")
+
+    def succeeded(self):
+        """Recovers the refill rate additively towards the base rate."""
+        with self.lock:
+            if self.rate < self.base_rate:
+                self.rate = min(self.base_rate, self.rate + self.base_rate * 0.05)
+
+
+class _Source:
+    def __init__(self, name, budget):
+        self.name = name
+        self.budget = budget
+        self.bucket = TokenBucket(budget.rate, budget.burst)
+        self.slots = threading.BoundedSemaphore(budget.max_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=budget.max_concurrency, thread_name_prefix=f"fetch-{name}")
+        # Hedges have their own slots and threads, so they never queue behind the slow requests they race
+        self.hedge_slots = threading.BoundedSemaphore(max(1, budget.max_hedges))
+        self.hedge_executor = ThreadPoolExecutor(max_workers=max(1, budget.max_hedges), thread_name_prefix=f"fetch-{name}-hedge")
+
+
+class FetchScheduler:
+    """Runs fetches per source under a token bucket and concurrency budget, with retries, hedging and stale fallback."""
+
+    def __init__(self, budgets=None):
+        self.sources = {name: _Source(name, budget) for name, budget in (budgets or DEFAULT_BUDGETS).items()}
+        self.cache = OrderedDict()  # (source, key) -> (fetched_at, value)
+        self.cache_lock = threading.Lock()
+        self.revalidating = set()
+        self.batch_executor = ThreadPoolExecutor(max_workers=sum(s.budget.max_concurrency for s in self.sources.values()), thread_name_prefix="fetch-batch")
+
+    # --- cache ---
+    def _cached(self, source, key):
+        with self.cache_lock:
+            return self.cache.get((source, key))
+
+    def _store(self, source, key, value):
+        with self.cache_lock:
+            self.cache[(source, key)] = (time.monotonic(), value)
+            self.cache.move_to_end((source, key))
+            while len(self.cache) > MAX_CACHE_ENTRIES:
+                self.cache.popitem(last=False)
+
+    def invalidate(self, source=None):
+        """Drops cached results, for one source or all of them."""
+        with self.cache_lock:
+            for cache_key in [k for k in self.cache if source is None or k[0] == source]:
+                del self.cache[cache_key]
+
+    # --- request execution ---
+    def _attempt(self, src, fn, args, kwargs):
+        with src.slots:
+            src.bucket.acquire()
+            result = fn(*args, **kwargs)
+        src.bucket.succeeded()
+        return result
+
+    def _hedge_attempt(self, src, fn, args, kwargs):
+        """Runs a hedge in a hedge slot already taken by _hedged, releasing it when done."""
+        try:
+            src.bucket.acquire()
+            result = fn(*args, **kwargs)
+        finally:
+            src.hedge_slots.release()
+        src.bucket.succeeded()
+        return result
+
+    def _hedged(self, src, fn, args, kwargs):
+        """Runs one attempt; if it is still pending after hedge_after seconds, races a duplicate against it."""
+        if src.budget.hedge_after is None:
+            return self._attempt(src, fn, args, kwargs)
+
+        primary = src.executor.submit(self._attempt, src, fn, args, kwargs)
+        done, _ = wait([primary], timeout=src.budget.hedge_after)
+        if done:
+            return primary.result()
+
+        if not src.hedge_slots.acquire(blocking=False):
+            # Every hedge slot is racing another slow request; keep waiting on the primary
+            return primary.result()
+        logging.info(f"[{src.name}] request slower than {src.budget.hedge_after}s, sending hedged request.")
+        pending = {primary, src.hedge_executor.submit(self._hedge_attempt, src, fn, args, kwargs)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _with_retry(self, src, key, fn, args, kwargs):
+        budget = src.budget
+        for attempt in range(budget.max_retries + 1):
+            try:
+                return self._hedged(src, fn, args, kwargs)
+            except Exception as e:
+                if is_throttle_error(e):
+                    src.bucket.throttled()
+                if attempt == budget.max_retries:
+                    raise
+                # Full jitter keeps retries from many symbols from re-synchronising
+                delay = random.uniform(0, min(budget.backoff_max, budget.backoff_base * 2 ** attempt))
+                logging.warning(f"[{src.name}] fetch {key} failed (attempt {attempt + 1}/{budget.max_retries + 1}): {e}. Retrying in {delay:.1f}s.")
+                time.sleep(delay)
+
+    def _revalidate(self, source, key, fn, args, kwargs):
+        src = self.sources[source]
+        try:
+            self._store(source, key, self._with_retry(src, key, fn, args, kwargs))
+        except Exception as e:
+            logging.warning(f"[{source}] background revalidation of {key} failed: {e}")
+        finally:
+            with self.cache_lock:
+                self.revalidating.discard((source, key))
+
+    def fetch(self, source, key, fn, *args, fresh=False, **kwargs):
+        """Returns fn(*args, **kwargs) for key, serving fresh cache hits directly and stale ones while revalidating in the background.
+
+        With fresh=True a stale entry is refetched before returning and served only if that refetch fails;
+        callers that cache the result themselves (st.cache_data) use it so staleness does not stack.
+        """
+        src = self.sources[source]
+        cached = self._cached(source, key)
+        if cached is not None:
+            fetched_at, value = cached
+            if time.monotonic() - fetched_at < src.budget.ttl:
+                return value
+            if fresh:
+                try:
+                    value = self._with_retry(src, key, fn, args, kwargs)
+                except Exception as e:
+                    logging.warning(f"[{source}] refetch of {key} failed, serving the stale copy: {e}")
+                    return value
+                self._store(source, key, value)
+                return value
+            with self.cache_lock:
+                start_revalidation = (source, key) not in self.revalidating
+                self.revalidating.add((source, key))
+            if start_revalidation:
+                self.batch_executor.submit(self._revalidate, source, key, fn, args, kwargs)
+            return value
+
+        value = self._with_retry(src, key, fn, args, kwargs)
+        self._store(source, key, value)
+        return value
+
+    def fetch_many(self, source, calls, fresh=False):
+        """Fetches {key: (fn, args)} concurrently within the source budget; failed keys map to None."""
+        futures = {key: self.batch_executor.submit(self.fetch, source, key, fn, *args, fresh=fresh) for key, (fn, args) in calls.items()}
+        results = {}
+        for key, future in futures.items():
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                logging.error(f"[{source}] fetch {key} failed after retries: {e}")
+                results[key] = None
+        return results
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Returns the process-wide fetch scheduler."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = FetchScheduler()
+    return _scheduler
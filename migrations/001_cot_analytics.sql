@@ -0,0 +1,82 @@
+-- COT analytics computed inside the database.
+--
+-- cot_net_ratio_changes: one row per asset and report with the week-over-week
+-- change of the net position ratio (long - short) / (long + short) for each
+-- trader category, plus the report's rank (1 = latest) within its asset.
+--
+-- cot_asset_thresholds(): one compact row per asset with the latest ratio
+-- changes and the positive/negative percentile thresholds over the last
+-- p_limit reports, matching the client-side calculation in cot_analysis.py.
+
+CREATE OR REPLACE VIEW cot_net_ratio_changes AS
+WITH ratios AS (
+    SELECT
+        market_and_exchange_names,
+        report_date,
+        CASE WHEN COALESCE(noncomm_positions_long_all, 0) + COALESCE(noncomm_positions_short_all, 0) = 0 THEN 0
+             ELSE (COALESCE(noncomm_positions_long_all, 0) - COALESCE(noncomm_positions_short_all, 0))::double precision
+                  / (COALESCE(noncomm_positions_long_all, 0) + COALESCE(noncomm_positions_short_all, 0))
+        END AS noncomm_net_ratio,
+        CASE WHEN COALESCE(comm_positions_long_all, 0) + COALESCE(comm_positions_short_all, 0) = 0 THEN 0
+             ELSE (COALESCE(comm_positions_long_all, 0) - COALESCE(comm_positions_short_all, 0))::double precision
+                  / (COALESCE(comm_positions_long_all, 0) + COALESCE(comm_positions_short_all, 0))
+        END AS comm_net_ratio,
+        CASE WHEN COALESCE(nonrept_positions_long_all, 0) + COALESCE(nonrept_positions_short_all, 0) = 0 THEN 0
+             ELSE (COALESCE(nonrept_positions_long_all, 0) - COALESCE(nonrept_positions_short_all, 0))::double precision
+                  / (COALESCE(nonrept_positions_long_all, 0) + COALESCE(nonrept_positions_short_all, 0))
+        END AS nonrept_net_ratio
+    FROM cot_reports
+)
+SELECT
+    market_and_exchange_names,
+    report_date,
+    noncomm_net_ratio - LAG(noncomm_net_ratio) OVER w AS noncomm_net_ratio_change,
+    comm_net_ratio - LAG(comm_net_ratio) OVER w AS comm_net_ratio_change,
+    nonrept_net_ratio - LAG(nonrept_net_ratio) OVER w AS nonrept_net_ratio_change,
+    ROW_NUMBER() OVER (PARTITION BY market_and_exchange_names ORDER BY report_date DESC) AS report_rank
+FROM ratios
+WINDOW w AS (PARTITION BY market_and_exchange_names ORDER BY report_date);
+
+
+CREATE OR REPLACE FUNCTION cot_asset_thresholds(
+    p_assets text[] DEFAULT NULL,
+    p_limit integer DEFAULT 52,
+    p_percentile double precision DEFAULT 0.4
+)
+RETURNS TABLE (
+    market_and_exchange_names text,
+    report_date date,
+    change_count bigint,
+    noncomm_net_ratio_change double precision,
+    comm_net_ratio_change double precision,
+    nonrept_net_ratio_change double precision,
+    noncomm_positive_threshold double precision,
+    noncomm_negative_threshold double precision,
+    comm_positive_threshold double precision,
+    comm_negative_threshold double precision,
+    nonrept_positive_threshold double precision,
+    nonrept_negative_threshold double precision
+)
+LANGUAGE sql
+STABLE
+AS $$
+    -- p_limit reports yield p_limit - 1 changes (ranks 1 .. p_limit - 1);
+    -- negative thresholds are percentiles of the absolute negative changes.
+    SELECT
+        c.market_and_exchange_names::text,
+        MAX(c.report_date)::date,
+        COUNT(c.noncomm_net_ratio_change),
+        MAX(c.noncomm_net_ratio_change) FILTER (WHERE c.report_rank = 1),
+        MAX(c.comm_net_ratio_change) FILTER (WHERE c.report_rank = 1),
+        MAX(c.nonrept_net_ratio_change) FILTER (WHERE c.report_rank = 1),
+        COALESCE(percentile_cont(p_percentile) WITHIN GROUP (ORDER BY c.noncomm_net_ratio_change) FILTER (WHERE c.noncomm_net_ratio_change > 0), 0),
+        COALESCE(percentile_cont(p_percentile) WITHIN GROUP (ORDER BY -c.noncomm_net_ratio_change) FILTER (WHERE c.noncomm_net_ratio_change < 0), 0),
+        COALESCE(percentile_cont(p_percentile) WITHIN GROUP (ORDER BY c.comm_net_ratio_change) FILTER (WHERE c.comm_net_ratio_change > 0), 0),
+        COALESCE(percentile_cont(p_percentile) WITHIN GROUP (ORDER BY -c.comm_net_ratio_change) FILTER (WHERE c.comm_net_ratio_change < 0), 0),
+        COALESCE(percentile_cont(p_percentile) WITHIN GROUP (ORDER BY c.nonrept_net_ratio_change) FILTER (WHERE c.nonrept_net_ratio_change > 0), 0),
+        COALESCE(percentile_cont(p_percentile) WITHIN GROUP (ORDER BY -c.nonrept_net_ratio_change) FILTER (WHERE c.nonrept_net_ratio_change < 0), 0)
+    FROM cot_net_ratio_changes c
+    WHERE (p_assets IS NULL OR c.market_and_exchange_names = ANY(p_assets))
+      AND c.report_rank < p_limit
+    GROUP BY c.market_and_exchange_names;
+$$;
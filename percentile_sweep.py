@@ -0,0 +1,56 @@
+import numpy as np
+
+
+class SortedPercentiles:
+    """Keeps one sorted array per series key and answers percentile queries by index lookup.
+
+    Sorting happens once in add(); percentile(), percentiles() and rank() are O(1)/O(log n) per query
+    and interpolate linearly between closest ranks, matching np.percentile and pandas quantile defaults.
+    """
+
+    def __init__(self):
+        self._sorted = {}
+
+    def add(self, key, values):
+        """Sorts and stores a series (NaN dropped) under key, replacing any previous one."""
+        values = np.asarray(values, dtype=float).ravel()
+        self._sorted[key] = np.sort(values[~np.isnan(values)])
+
+    def __contains__(self, key):
+        return key in self._sorted
+
+    def keys(self):
+        return self._sorted.keys()
+
+    def count(self, key):
+        """Number of values stored for key (0 when unknown)."""
+        return len(self._sorted.get(key, ()))
+
+    def sorted_values(self, key):
+        return self._sorted[key]
+
+    def percentiles(self, key, qs, default=np.nan):
+        """Returns the q-th percentiles (0-100) of a series; default for unknown or empty series."""
+        qs = np.asarray(qs, dtype=float)
+        values = self._sorted.get(key)
+        if values is None or len(values) == 0:
+            return np.full(qs.shape, default, dtype=float)
+        position = np.clip(qs, 0, 100) / 100 * (len(values) - 1)
+        lower = np.floor(position).astype(int)
+        upper = np.minimum(lower + 1, len(values) - 1)
+        return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+    def percentile(self, key, q, default=np.nan):
+        """Returns the q-th percentile (0-100) of a series; default for unknown or empty series."""
+        return float(self.percentiles(key, [q], default)[0])
+
+    def rank(self, key, value):
+        """Percentile rank (0-100) of value within a series: share of values <= value."""
+        values = self._sorted.get(key)
+        if values is None or len(values) == 0 or np.isnan(value):
+            return np.nan
+        return np.searchsorted(values, value, side="right") / len(values) * 100
+
+    def table(self, q, keys=None, default=np.nan):
+        """Returns {key: q-th percentile} for the given keys (default: all)."""
+        return {key: self.percentile(key, q, default) for key in (self._sorted if keys is None else keys)}
@@ -0,0 +1,201 @@
+import os
+import sys
+import logging
+import threading
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from psycopg2 import sql
+from psycopg2.pool import ThreadedConnectionPool
+
+# Settings below (and COT_BACKEND) may live in .env next to the connection settings
+load_dotenv()
+
+# Only the columns the analysis actually uses
+COT_POSITION_COLUMNS = [
+    "noncomm_positions_long_all",
+    "noncomm_positions_short_all",
+    "comm_positions_long_all",
+    "comm_positions_short_all",
+    "nonrept_positions_long_all",
+    "nonrept_positions_short_all",
+]
+COT_COLUMNS = ["market_and_exchange_names", "report_date"] + COT_POSITION_COLUMNS
+
+POOL_MIN_CONNECTIONS = int(os.environ.get("PG_POOL_MIN", 1))
+POOL_MAX_CONNECTIONS = int(os.environ.get("PG_POOL_MAX", 8))
+CURSOR_ITERSIZE = int(os.environ.get("PG_CURSOR_ITERSIZE", 2000))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def use_postgres_backend():
+    """Returns True when COT reads are configured to go through the direct Postgres backend.
+
+    COT_BACKEND selects the data-access backend: "supabase" (PostgREST, default) or "postgres" (direct psycopg2).
+    """
+    return os.environ.get("COT_BACKEND", "supabase").lower() == "postgres"
+
+
+def _connection_kwargs():
+    """Builds psycopg2 connection arguments from DATABASE_URL or the individual .env settings."""
+    database_url = os.environ.get("DATABASE_URL")
+    if database_url:
+        return {"dsn": database_url}
+
+    kwargs = {
+        "user": os.environ.get("user"),
+        "password": os.environ.get("password"),
+        "host": os.environ.get("host"),
+        "port": os.environ.get("port"),
+        "dbname": os.environ.get("dbname"),
+    }
+    if not kwargs["host"] or not kwargs["dbname"]:
+        raise ValueError("DATABASE_URL or host/dbname must be set in environment or .env file.")
+    return {k: v for k, v in kwargs.items() if v}
+
+
+def get_pool():
+    """Returns the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                logging.info(f"Creating Postgres connection pool ({POOL_MIN_CONNECTIONS}-{POOL_MAX_CONNECTIONS} connections).")
+                _pool = ThreadedConnectionPool(POOL_MIN_CONNECTIONS, POOL_MAX_CONNECTIONS, **_connection_kwargs())
+    return _pool
+
+
+def close_pool():
+    """Closes all pooled connections (used on shutdown and in tests)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+@contextmanager
+def pooled_connection():
+    """Borrows a connection from the pool and returns it when done."""
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+
+def _cot_query(asset_names, limit=None):
+    """Builds the narrow COT select, newest report first per asset."""
+    query = sql.SQL("SELECT {columns} FROM cot_reports WHERE market_and_exchange_names = ANY(%s) ORDER BY market_and_exchange_names, report_date DESC").format(
+        columns=sql.SQL(", ").join(sql.Identifier(c) for c in COT_COLUMNS)
+    )
+    params = [list(asset_names)]
+    if limit is not None:
+        # Rank inside each asset so one round trip serves many assets
+        query = sql.SQL(
+            "SELECT {columns} FROM (SELECT {columns}, ROW_NUMBER() OVER (PARTITION BY market_and_exchange_names ORDER BY report_date DESC) AS rn "
+            "FROM cot_reports WHERE market_and_exchange_names = ANY(%s)) ranked WHERE rn <= %s ORDER BY market_and_exchange_names, report_date DESC"
+        ).format(columns=sql.SQL(", ").join(sql.Identifier(c) for c in COT_COLUMNS))
+        params.append(int(limit))
+    return query, params
+
+
+def stream_cot_rows(asset_names, limit=None, itersize=CURSOR_ITERSIZE):
+    """Yields COT rows as tuples (in COT_COLUMNS order) through a named server-side cursor."""
+    query, params = _cot_query(asset_names, limit)
+    with pooled_connection() as conn:
+        # Named cursors keep the result set on the server and fetch it in itersize batches
+        with conn.cursor(name=f"cot_stream_{uuid.uuid4().hex}") as cursor:
+            cursor.itersize = itersize
+            cursor.execute(query, params)
+            for row in cursor:
+                yield row
+
+
+def fetch_cot_arrays(asset_names, limit=None, itersize=CURSOR_ITERSIZE):
+    """Streams COT rows into NumPy arrays: asset names, report dates and an (n, 6) position matrix."""
+    names, dates, positions = [], [], []
+    for row in stream_cot_rows(asset_names, limit=limit, itersize=itersize):
+        names.append(row[0])
+        dates.append(row[1])
+        positions.append(row[2:])
+
+    position_matrix = np.array(positions, dtype=float).reshape(-1, len(COT_POSITION_COLUMNS))
+    # Missing position values behave like the .get(..., 0) defaults of the PostgREST path
+    position_matrix = np.nan_to_num(position_matrix, nan=0.0)
+    return np.array(names, dtype=object), np.array(dates, dtype="datetime64[D]"), position_matrix
+
+
+def fetch_cot_frame(asset_names, limit=None, itersize=CURSOR_ITERSIZE):
+    """Streams COT rows into a DataFrame with only the needed columns."""
+    names, dates, positions = fetch_cot_arrays(asset_names, limit=limit, itersize=itersize)
+    df = pd.DataFrame(positions, columns=COT_POSITION_COLUMNS)
+    df.insert(0, "report_date", dates)
+    df.insert(0, "market_and_exchange_names", names)
+    return df
+
+
+def fetch_cot_reports(asset_name, limit=52):
+    """Fetches the latest COT reports for one asset as a list of dicts, newest first (same shape as the Supabase fetchers)."""
+    query, params = _cot_query([asset_name], limit)
+    with pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+    reports = []
+    for row in rows:
+        report = dict(zip(COT_COLUMNS, row))
+        for column in COT_POSITION_COLUMNS:
+            report[column] = float(report[column]) if report[column] is not None else 0
+        reports.append(report)
+    return reports
+
+
+def fetch_cot_thresholds(asset_names, limit=52, percentile=0.4):
+    """Calls cot_asset_thresholds() (migrations/001_cot_analytics.sql) and returns one dict per asset."""
+    with pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT * FROM cot_asset_thresholds(%s, %s, %s)", [list(asset_names), int(limit), float(percentile)])
+            columns = [c.name for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+# Smoke test against a local Postgres (e.g. DATABASE_URL=postgresql://localhost/cot python postgres_client.py); exits 1 on failure
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    print("--- Testing Postgres COT backend ---")
+    failed = False
+    try:
+        with pooled_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT DISTINCT market_and_exchange_names FROM cot_reports LIMIT 3")
+                assets = [r[0] for r in cursor.fetchall()]
+        print(f"Assets found: {assets}")
+        if not assets:
+            raise RuntimeError("cot_reports has no rows")
+        reports = fetch_cot_reports(assets[0], limit=2)
+        print(f"Latest reports for {assets[0]}: {reports}")
+        frame = fetch_cot_frame(assets, limit=52, itersize=50)
+        print(f"Streamed {len(frame)} rows via server-side cursor:")
+        print(frame.groupby("market_and_exchange_names").size())
+        # Both read paths must agree on the latest report
+        latest = frame[frame["market_and_exchange_names"] == assets[0]].iloc[0]
+        if not reports or str(latest["report_date"])[:10] != str(reports[0]["report_date"])[:10]:
+            raise RuntimeError("fetch_cot_reports and fetch_cot_frame disagree on the latest report")
+    except Exception as e:
+        print(f"Postgres backend test failed: {e}")
+        failed = True
+    finally:
+        close_pool()
+    print("--- Postgres COT backend test finished ---")
+    sys.exit(1 if failed else 0)
@@ -3,6 +3,8 @@ from yahooquery import Ticker
 from datetime import datetime, timedelta
 from ta.volatility import AverageTrueRange
 import pytz
+import postgres_client
+from fetch_scheduler import get_scheduler
 
 # --- Ticker Map ---
 TICKER_MAP = {
@@ -55,37 +57,42 @@ def calculate_latest_net_ratio_changes(reports):
     return changes
 
 # --- Fetch price data ---
-def fetch_price_data(symbol):
+PRICE_HISTORY_DAYS = 365
+
+def download_price_history(symbol, days=PRICE_HISTORY_DAYS):
     end = datetime.utcnow()
-    start = end - timedelta(days=365)
+    start = end - timedelta(days=days)
+    df = Ticker(symbol).history(start=start.strftime('%Y-%m-%d'), end=end.strftime('%Y-%m-%d'), interval='1d')
+    if not isinstance(df, pd.DataFrame):
+        raise RuntimeError(f"No history returned for {symbol}: {df}")
+    return df
 
-    try:
-        t = Ticker(symbol)
-        df = t.history(start=start.strftime('%Y-%m-%d'), end=end.strftime('%Y-%m-%d'), interval='1d')
+def price_history_key(symbol, days=PRICE_HISTORY_DAYS):
+    return f"history:{symbol}:{days}d:1d"
 
-        if df.empty:
-            return pd.DataFrame()
+def fetch_price_data(symbol, days=PRICE_HISTORY_DAYS):
+    # Retries, backoff and stale fallback are handled by the shared scheduler; a download that still fails raises
+    df = get_scheduler().fetch("yahoo", price_history_key(symbol, days), download_price_history, symbol, days).copy()
 
-        if isinstance(df.index, pd.MultiIndex):
-            df = df.reset_index()
+    if df.empty:
+        return pd.DataFrame()
 
-        df["datetime"] = pd.to_datetime(df["date"], utc=True)
-        df = df.sort_values("datetime")
+    if isinstance(df.index, pd.MultiIndex):
+        df = df.reset_index()
 
-        # Convert to GMT+3 (Etc/GMT-3 is inverted)
-        df["datetime"] = df["datetime"].dt.tz_convert("Etc/GMT-3")
+    df["datetime"] = pd.to_datetime(df["date"], utc=True)
+    df = df.sort_values("datetime")
 
-        df["avg_volume"] = df["volume"].rolling(window=5).mean()
-        df["rvol"] = df["volume"] / df["avg_volume"]
+    # Convert to GMT+3 (Etc/GMT-3 is inverted)
+    df["datetime"] = df["datetime"].dt.tz_convert("Etc/GMT-3")
 
-        atr = AverageTrueRange(high=df["high"], low=df["low"], close=df["close"], window=14)
-        df["atr"] = atr.average_true_range()
+    df["avg_volume"] = df["volume"].rolling(window=5).mean()
+    df["rvol"] = df["volume"] / df["avg_volume"]
 
-        return df
+    atr = AverageTrueRange(high=df["high"], low=df["low"], close=df["close"], window=14)
+    df["atr"] = atr.average_true_range()
 
-    except Exception as e:
-        print(f"Error fetching {symbol}: {e}")
-        return pd.DataFrame()
+    return df
 
 # --- Dummy COT Fetch ---
 def fetch_cot_reports_dummy(asset_name, limit=5):
@@ -105,47 +112,76 @@ def fetch_cot_reports_dummy(asset_name, limit=5):
         })
     return data
 
+# --- COT Fetch (dummy data unless COT_BACKEND=postgres) ---
+def fetch_cot_reports(asset_name, limit=5):
+    if not postgres_client.use_postgres_backend():
+        return fetch_cot_reports_dummy(asset_name, limit)
+
+    try:
+        reports = postgres_client.fetch_cot_reports(asset_name, limit=limit)
+    except Exception as e:
+        print(f"Error fetching COT reports for {asset_name}: {e}")
+        return []
+    # forward_fill_cot_changes compares report dates against datetime.date values
+    for report in reports:
+        if isinstance(report["report_date"], datetime):
+            report["report_date"] = report["report_date"].date()
+    return reports
+
 # --- Apply COT Changes Forward ---
-def forward_fill_cot_changes(price_df, cot_reports):
+def cot_change_rows(cot_reports):
+    """Each report's net ratio changes vs. the previous report, oldest first."""
     cot_reports = sorted(cot_reports, key=lambda x: x['report_date'])
-    ranges = []
-
-    for i in range(len(cot_reports) - 1):
-        start = cot_reports[i]['report_date']
-        end = cot_reports[i + 1]['report_date'] - timedelta(days=1)
-        changes = calculate_latest_net_ratio_changes([cot_reports[i + 1], cot_reports[i]])
+    rows = []
+    for i in range(1, len(cot_reports)):
+        changes = calculate_latest_net_ratio_changes([cot_reports[i], cot_reports[i - 1]])
         if changes:
-            ranges.append((start, end, changes))
+            rows.append({"cot_report_date": cot_reports[i]['report_date'], **changes})
+    return rows
+
+def forward_fill_cot_changes(price_df, cot_reports):
+    change_cols = [f"{cat}_net_ratio_change" for cat in TRADER_CATEGORIES]
 
-    last = calculate_latest_net_ratio_changes([cot_reports[-1], cot_reports[-2]])
-    if last:
-        ranges.append((cot_reports[-1]['report_date'], datetime.utcnow().date(), last))
+    # Each report's change vs. the previous report applies from its own report date until the next report (no lookahead)
+    rows = cot_change_rows(cot_reports)
 
     df = price_df.copy()
     df["date"] = df["datetime"].dt.date
 
-    for col in [f"{cat}_net_ratio_change" for cat in TRADER_CATEGORIES]:
-        df[col] = None
+    if not rows:
+        for col in change_cols + ["cot_report_date"]:
+            df[col] = None
+        return df
 
-    for start, end, changes in ranges:
-        mask = (df["date"] >= start) & (df["date"] <= end)
-        for k, v in changes.items():
-            df.loc[mask, k] = v
-
-    return df
+    changes_df = pd.DataFrame(rows)
+    # Both keys in one unit: merge_asof refuses datetime64 keys of different resolutions
+    df["_date_key"] = pd.to_datetime(df["date"]).astype("datetime64[ns]")
+    changes_df["_date_key"] = pd.to_datetime(changes_df["cot_report_date"]).astype("datetime64[ns]")
+    df = pd.merge_asof(df.sort_values("_date_key"), changes_df.sort_values("_date_key"), on="_date_key", direction="backward")
+    return df.drop(columns="_date_key")
 
 # --- Run All Assets ---
-def run_multi_asset_analysis():
+def run_multi_asset_analysis(days=PRICE_HISTORY_DAYS, cot_limit=5, return_cot_changes=False):
+    """Combined price/COT frame; with return_cot_changes also every report's changes (symbol, cot_report_date, *_net_ratio_change),
+    including reports older than the first price bar."""
     all_data = []
+    all_changes = []
+
+    # Download all price histories concurrently within the Yahoo budget
+    get_scheduler().fetch_many("yahoo", {price_history_key(symbol, days): (download_price_history, (symbol, days)) for symbol in TICKER_MAP.values()})
 
     for asset_name, symbol in TICKER_MAP.items():
         print(f"\n📊 Processing: {asset_name} | Symbol: {symbol}")
-        price_df = fetch_price_data(symbol)
+        try:
+            price_df = fetch_price_data(symbol, days)
+        except Exception as e:
+            print(f"Error fetching {symbol}: {e}")
+            price_df = pd.DataFrame()
         if price_df.empty:
             print("⚠️ Price data unavailable.")
             continue
 
-        cot_reports = fetch_cot_reports_dummy(asset_name)
+        cot_reports = fetch_cot_reports(asset_name, limit=cot_limit)
         if len(cot_reports) < 2:
             print("⚠️ COT data unavailable.")
             continue
@@ -155,8 +191,11 @@ def run_multi_asset_analysis():
         enriched_df["symbol"] = symbol
 
         all_data.append(enriched_df)
+        all_changes.extend({"symbol": symbol, **row} for row in cot_change_rows(cot_reports))
 
     final_df = pd.concat(all_data, ignore_index=True)
+    if return_cot_changes:
+        return final_df, pd.DataFrame(all_changes)
     return final_df
 
 # --- Execute ---
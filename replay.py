@@ -0,0 +1,185 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+TRADER_CATEGORIES = ["noncomm", "comm", "nonrept"]
+
+# Replay defaults mirror the live screens
+COT_WINDOW_REPORTS = 52      # reports per threshold window (cot_analysis uses the last 52 reports)
+COT_PERCENTILE = 40
+COT_RELEASE_LAG_DAYS = 3     # Tuesday positions are published on Friday
+GAP_THRESHOLD = 1.5
+HORIZONS = (1, 5, 10)        # forward horizons in bars
+
+
+def _naive(datetimes):
+    """Drops the timezone but keeps local wall time, so bars and fire dates compare on the same clock.
+
+    The result is always datetime64[ns]: date objects parse to [s] and Timedelta arithmetic to [us],
+    and merge_asof refuses keys of different units.
+    """
+    datetimes = pd.to_datetime(pd.Series(datetimes))
+    if datetimes.dt.tz is not None:
+        datetimes = datetimes.dt.tz_localize(None)
+    return datetimes.astype("datetime64[ns]")
+
+
+def add_forward_moves(df, horizons=HORIZONS):
+    """Adds fwd_ret_{h} (close-to-close return) and fwd_atr_{h} (move in ATRs) per symbol for each horizon."""
+    df = df.sort_values(["symbol", "datetime"]).reset_index(drop=True)
+    close = df.groupby("symbol", sort=False)["close"]
+    for h in horizons:
+        future_close = close.shift(-h)
+        df[f"fwd_ret_{h}"] = future_close / df["close"] - 1
+        df[f"fwd_atr_{h}"] = (future_close - df["close"]) / df["atr"].replace(0, np.nan)
+    return df
+
+
+def cot_reports_from_bars(df):
+    """One row per (symbol, report) with the *_net_ratio_change columns, taken from the combined bar frame.
+
+    Only reports that reach a price bar survive the forward fill, so history before the first bar is
+    missing; prefer the full change list from run_multi_asset_analysis(return_cot_changes=True).
+    """
+    change_cols = [f"{cat}_net_ratio_change" for cat in TRADER_CATEGORIES]
+    return df.dropna(subset=["cot_report_date"]).drop_duplicates(subset=["symbol", "cot_report_date"])[["symbol", "cot_report_date"] + change_cols]
+
+
+def cot_threshold_events(reports, window=COT_WINDOW_REPORTS, percentile=COT_PERCENTILE, release_lag_days=COT_RELEASE_LAG_DAYS):
+    """Replays the COT significant-change filter at every report with a rolling, point-in-time threshold.
+
+    Expects one row per (symbol, report) with cot_report_date and the *_net_ratio_change columns,
+    covering the full report history (not just the reports that reach a price bar). For each report
+    the positive/negative thresholds are the percentile of the positive/absolute-negative changes
+    among the last `window` reports (window - 1 changes), exactly as cot_analysis computes them live;
+    reports without a full window behind them do not fire. Each event fires on the first bar on or
+    after report_date + release_lag_days. Returns one row per (report, category, direction) that fired.
+    """
+    change_cols = [f"{cat}_net_ratio_change" for cat in TRADER_CATEGORIES]
+    reports = reports.sort_values(["symbol", "cot_report_date"]).reset_index(drop=True)
+    if reports.empty:
+        return pd.DataFrame(columns=["symbol", "signal", "direction", "value", "threshold", "fire_date"])
+
+    q = percentile / 100
+    grouped_rolling = lambda s: s.groupby(reports["symbol"], sort=False).rolling(window - 1, min_periods=1).quantile(q).reset_index(level=0, drop=True)
+    # The window holds window - 1 changes including the current one
+    full_window = reports.groupby("symbol", sort=False).cumcount() >= window - 2
+    events = []
+    for cat, col in zip(TRADER_CATEGORIES, change_cols):
+        change = reports[col].astype(float)
+        # Rolling quantiles skip NaN, so masking keeps only positive (or negative) changes in each window
+        pos_threshold = grouped_rolling(change.where(change > 0)).fillna(0)
+        neg_threshold = grouped_rolling((-change).where(change < 0)).fillna(0)
+        for direction, fired, threshold in (
+            ("long", full_window & (change > pos_threshold) & (pos_threshold > 0), pos_threshold),
+            ("short", full_window & (change < -neg_threshold) & (neg_threshold > 0), neg_threshold),
+        ):
+            events.append(pd.DataFrame({
+                "symbol": reports["symbol"][fired],
+                "signal": f"cot_{cat}_{direction}",
+                "direction": direction,
+                "value": change[fired],
+                "threshold": threshold[fired],
+                "fire_date": _naive(pd.to_datetime(reports["cot_report_date"][fired]) + pd.Timedelta(days=release_lag_days)),
+            }))
+    return pd.concat(events, ignore_index=True)
+
+
+def gap_up_events(df, threshold=GAP_THRESHOLD, open_hours=None):
+    """Replays the gap-up rule on every day: open-window rvol mean vs. the previous day's >= threshold.
+
+    With intraday bars and `open_hours` (GMT+3 hours) the open window is averaged per day as in the
+    RVol dashboard; for daily bars the day's rvol is compared with the previous bar's rvol.
+    """
+    bars = df[["symbol", "datetime", "rvol"]].copy()
+    bars["day"] = bars["datetime"].dt.date
+    if open_hours is not None:
+        bars = bars[bars["datetime"].dt.hour.isin(open_hours)]
+    # The signal is known at the last bar of the open window, so it fires there
+    daily = bars.groupby(["symbol", "day"], sort=True).agg(rvol=("rvol", "mean"), fire_date=("datetime", "max")).reset_index()
+    daily["fire_date"] = _naive(daily["fire_date"])
+    prev = daily.groupby("symbol", sort=False)["rvol"].shift(1)
+    daily["value"] = daily["rvol"] / prev.where(prev > 0)
+    fired = daily[daily["value"] >= threshold]
+    return pd.DataFrame({
+        "symbol": fired["symbol"],
+        "signal": "gap_up",
+        "direction": "long",
+        "value": fired["value"],
+        "threshold": threshold,
+        "fire_date": fired["fire_date"],
+    }).reset_index(drop=True)
+
+
+def attach_forward_moves(events, bars, horizons=HORIZONS):
+    """Maps each event to the first bar on or after its fire date and attaches that bar's forward moves."""
+    if events.empty:
+        return events
+    fwd_cols = [f"fwd_{kind}_{h}" for h in horizons for kind in ("ret", "atr")]
+    bars = bars[["symbol", "datetime"] + fwd_cols].copy()
+    bars["_key"] = _naive(bars["datetime"])
+    events = events.copy()
+    events["_key"] = _naive(events["fire_date"])
+    # Events before a symbol's first bar (warm-up reports) have no bar of their own to attach to
+    events = events[events["_key"] >= events["symbol"].map(bars.groupby("symbol")["_key"].min())]
+    if events.empty:
+        return events.drop(columns="_key")
+    merged = pd.merge_asof(
+        events.sort_values("_key"), bars.sort_values("_key"),
+        on="_key", by="symbol", direction="forward"
+    )
+    return merged.drop(columns="_key").dropna(subset=["datetime"]).reset_index(drop=True)
+
+
+def summarize_events(events, horizons=HORIZONS):
+    """Per-signal count, mean/median forward return, directional hit rate and mean ATR-normalised move."""
+    if events.empty:
+        return pd.DataFrame()
+    sign = np.where(events["direction"] == "short", -1.0, 1.0)
+    summary = {"count": events.groupby("signal").size()}
+    for h in horizons:
+        grouped = events.groupby("signal")
+        summary[f"mean_ret_{h}"] = grouped[f"fwd_ret_{h}"].mean()
+        summary[f"median_ret_{h}"] = grouped[f"fwd_ret_{h}"].median()
+        summary[f"hit_rate_{h}"] = (events[f"fwd_ret_{h}"] * sign > 0).where(events[f"fwd_ret_{h}"].notna()).groupby(events["signal"]).mean()
+        summary[f"mean_atr_{h}"] = grouped[f"fwd_atr_{h}"].mean()
+    return pd.DataFrame(summary)
+
+
+def run_replay(df, days=730, cot_window=COT_WINDOW_REPORTS, cot_percentile=COT_PERCENTILE, gap_threshold=GAP_THRESHOLD,
+               open_hours=None, horizons=HORIZONS, release_lag_days=COT_RELEASE_LAG_DAYS, cot_changes=None):
+    """Replays both signal families over the combined price/COT frame; returns (events, summary).
+
+    cot_changes is the full per-report change list used to warm up the COT thresholds (defaults to the
+    reports found in the frame). Thresholds use all available history, but only events in the last
+    `days` days are reported.
+    """
+    bars = add_forward_moves(df, horizons)
+    if cot_changes is None:
+        cot_changes = cot_reports_from_bars(bars)
+    events = pd.concat([
+        cot_threshold_events(cot_changes, cot_window, cot_percentile, release_lag_days),
+        gap_up_events(bars, gap_threshold, open_hours),
+    ], ignore_index=True)
+    events = attach_forward_moves(events, bars, horizons)
+    if not events.empty and days is not None:
+        cutoff = events["fire_date"].max() - pd.Timedelta(days=days)
+        events = events[events["fire_date"] >= cutoff].reset_index(drop=True)
+    return events, summarize_events(events, horizons)
+
+
+# --- Execute ---
+if __name__ == "__main__":
+    from prototype_1 import run_multi_asset_analysis
+
+    # Two years of daily bars; enough weekly reports to fill a 52-report window before the replay period.
+    # Reports older than the first bar never reach the combined frame, so the change list is passed separately.
+    combined, cot_changes = run_multi_asset_analysis(days=730, cot_limit=104 + COT_WINDOW_REPORTS, return_cot_changes=True)
+    started = time.perf_counter()
+    events, summary = run_replay(combined, cot_changes=cot_changes)
+    elapsed = time.perf_counter() - started
+
+    pd.set_option("display.width", 200)
+    print(f"\n✅ Replayed {len(combined)} bars / {combined['symbol'].nunique()} symbols in {elapsed:.2f}s: {len(events)} signal events")
+    print(summary.round(4))
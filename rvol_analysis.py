@@ -0,0 +1,463 @@
+import os
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+from yahooquery import Ticker
+
+from fetch_scheduler import get_scheduler
+from compute_graph import ComputeGraph, Ref
+from session_calendar import CALENDARS, IN_SESSION, SESSION_WINDOWS, session_index, scheduled_display_hours, day_ordinal
+from percentile_sweep import SortedPercentiles
+
+# Ticker and ETF maps (from update_rvol.py)
+TICKER_MAP = {
+    "GOLD - COMMODITY EXCHANGE INC.": "GC=F",
+    "EURO FX - CHICAGO MERCANTILE EXCHANGE": "6E=F",
+    "AUSTRALIAN DOLLAR - CHICAGO MERCANTILE EXCHANGE": "6A=F",
+    "BITCOIN - CHICAGO MERCANTILE EXCHANGE": "BTC-USD",
+    "MICRO BITCOIN - CHICAGO MERCANTILE EXCHANGE": "MBT=F",
+    "MICRO ETHER - CHICAGO MERCANTILE EXCHANGE": "ETH-USD",
+    "SILVER - COMMODITY EXCHANGE INC.": "SI=F",
+    "WTI FINANCIAL CRUDE OIL - NEW YORK MERCANTILE EXCHANGE": "CL=F",
+    "JAPANESE YEN - CHICAGO MERCANTILE EXCHANGE": "6J=F",
+    "CANADIAN DOLLAR - CHICAGO MERCANTILE EXCHANGE": "6C=F",
+    "BRITISH POUND - CHICAGO MERCANTILE EXCHANGE": "6B=F",
+    "U.S. DOLLAR INDEX - ICE FUTURES U.S.": "DX-Y.NYB",
+    "NEW ZEALAND DOLLAR - CHICAGO MERCANTILE EXCHANGE": "6N=F",
+    "SWISS FRANC - CHICAGO MERCANTILE EXCHANGE": "6S=F",
+    "DOW JONES U.S. REAL ESTATE IDX - CHICAGO BOARD OF TRADE": "^DJI",
+    "E-MINI S&P 500 STOCK INDEX - CHICAGO MERCANTILE EXCHANGE": "ES=F",
+    "NASDAQ-100 STOCK INDEX (MINI) - CHICAGO MERCANTILE EXCHANGE": "NQ=F",
+    "NIKKEI STOCK AVERAGE - CHICAGO MERCANTILE EXCHANGE": "^N225",
+    "SPDR S&P 500 ETF TRUST": "SPY"
+}
+ETF_MAP = {
+    "GC=F": ("GLD", "SPDR Gold Trust"),
+    "SI=F": ("SLV", "iShares Silver Trust"),
+    "CL=F": ("USO", "United States Oil Fund"),
+    "6E=F": ("FXE", "Invesco CurrencyShares Euro"),
+    "6A=F": ("FXA", "Invesco CurrencyShares AUD"),
+    "6J=F": ("FXY", "Invesco CurrencyShares JPY"),
+    "6C=F": ("FXC", "Invesco CurrencyShares CAD"),
+    "6B=F": ("FXB", "Invesco CurrencyShares GBP"),
+    "6N=F": ("FXA", "Invesco CurrencyShares AUD"),
+    "6S=F": ("FXF", "Invesco CurrencyShares CHF"),
+    "DX-Y.NYB": ("UUP", "Invesco DB US Dollar Bullish"),
+    "BTC-USD": ("BITO", "ProShares Bitcoin Strategy ETF"),
+    "MBT=F": ("BITO", "ProShares Bitcoin Strategy ETF"),
+    "ETH-USD": ("ETHE", "Grayscale Ethereum Trust"),
+    "^DJI": ("IYR", "iShares U.S. Real Estate ETF"),
+    "ES=F": ("SPY", "SPDR S&P 500 ETF Trust"),
+    "NQ=F": ("QQQ", "Invesco QQQ Trust"),
+    "^N225": ("EWJ", "iShares MSCI Japan ETF"),
+    "SPY": ("SPY", "SPDR S&P 500 ETF Trust"),
+}
+
+DAYS = 730  # 2 years
+ROLLING_WINDOW = 120
+YAHOO_TIMEOUT = 20  # per request; slow responses are hedged and retried by the fetch scheduler
+
+# Remove ^N225 and DX-Y.NYB from TICKER_MAP and ETF_MAP
+TICKER_MAP = {k: v for k, v in TICKER_MAP.items() if v not in ["^N225", "DX-Y.NYB"]}
+ETF_MAP = {k: v for k, v in ETF_MAP.items() if k not in ["^N225", "DX-Y.NYB"] and v[0] not in ["^N225", "DX-Y.NYB"]}
+
+# All unique asset and ETF symbols
+symbols = list(set(TICKER_MAP.values()) | set(v[0] for v in ETF_MAP.values()))
+
+# Separate asset and ETF symbols
+asset_symbols = [v for v in TICKER_MAP.values() if v not in [etf[0] for etf in ETF_MAP.values()]]
+etf_symbols = list(set(v[0] for v in ETF_MAP.values()))
+
+# Load sector mapping from asset_category_map.json (next to this module, so headless runs work from any directory)
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "asset_category_map.json"), "r") as f:
+    ASSET_CATEGORY_MAP = json.load(f)
+# Build a reverse mapping: asset -> sector
+ASSET_TO_SECTOR = {asset: sector for sector, assets in ASSET_CATEGORY_MAP.items() for asset in assets}
+# Build a reverse mapping: ticker -> name
+TICKER_TO_NAME = {v: k for k, v in TICKER_MAP.items()}
+
+# Session windows used by the gap-up filter (session_calendar.SESSION_WINDOWS); local times follow DST
+MARKET_OPEN_WINDOWS = {
+    "London (08:00-10:00 London, 10:00-11:00 GMT+3 in summer)": "London",
+    "NY (09:00-11:00 New York, 16:00-17:00 GMT+3 in summer)": "NY",
+    "Asian (09:00-11:00 Tokyo, 3:00-4:00 GMT+3)": "Asian",
+}
+
+# Session calendar per sector; ETFs and cash indices use the NYSE session, spot crypto trades 24/7
+SECTOR_CALENDARS = {"FX": "fx", "Metals": "metals", "Energy": "energy", "Crypto": "futures"}
+
+# Features computed for every asset by build_rvol_feature_matrix
+GAP_FEATURES = ["gap_ratio", "curr_open_rvol", "prev_open_rvol"]
+RVOL_FEATURES = ["rvol_latest", "rvol_percentile", "rvol_threshold"]
+SECTOR_FEATURES = ["sector_score", "sector_score_threshold"]
+
+# Default percentile lines: rvol over 2 years, sector score over 2 years
+RVOL_PERCENTILE = 70
+SECTOR_SCORE_PERCENTILE = 82
+
+# Rolling window of the cross-asset rvol correlation (hourly rows) and the cluster merge threshold
+RVOL_CORRELATION_HOURS = 24 * 20
+RVOL_CLUSTER_CORRELATION = 0.5
+
+
+def session_calendar_for(symbol):
+    """Returns the session calendar of a symbol's instrument class."""
+    if symbol in etf_symbols or symbol.startswith("^"):
+        return CALENDARS["equity_etf"]
+    if symbol.endswith("-USD"):
+        return CALENDARS["crypto"]
+    return CALENDARS[SECTOR_CALENDARS.get(ASSET_TO_SECTOR.get(symbol), "futures")]
+
+
+def download_rvol_history(symbol):
+    t = Ticker(symbol, timeout=YAHOO_TIMEOUT)
+    hist = t.history(period=f"{DAYS}d", interval="1h")
+    if not isinstance(hist, pd.DataFrame):
+        # yahooquery reports errors (including throttling) as a dict/str instead of raising
+        raise RuntimeError(f"No history returned for {symbol}: {hist}")
+    return hist
+
+def prefetch_rvol_histories(symbols):
+    """Downloads all histories concurrently within the Yahoo budget; load_rvol_data then hits the scheduler cache."""
+    get_scheduler().fetch_many("yahoo", {f"history:{s}:{DAYS}d:1h": (download_rvol_history, (s,)) for s in symbols})
+
+def load_rvol_data(symbol):
+    """Downloads (through the fetch scheduler) and prepares 2 years of hourly bars with UTC timestamps, rvol and the session index.
+
+    Raises when the download fails after retries and there is no stale copy, so callers that cache
+    results (st.cache_data) do not keep an empty frame for the symbol.
+    """
+    try:
+        hist = get_scheduler().fetch("yahoo", f"history:{symbol}:{DAYS}d:1h", download_rvol_history, symbol)
+    except Exception as e:
+        logging.warning(f"Error fetching {symbol}: {e}")
+        raise
+    if not hist.empty:
+        if isinstance(hist.index, pd.MultiIndex):
+            hist = hist.reset_index()
+        hist = hist.rename(columns={"symbol": "ticker"})
+        hist = hist.dropna(subset=["volume", "date"])
+        hist = hist[hist["volume"] > 0]
+        hist["datetime"] = pd.to_datetime(hist["date"], errors="coerce", utc=True)
+        hist = hist.dropna(subset=["datetime"])
+        hist = hist.sort_values("datetime")
+        # GMT+3 times are derived from the UTC datetime (prepare_rvol_frame, session_index) rather than stored as strings
+        # Calculate avg_volume and rvol
+        hist["avg_volume"] = hist["volume"].rolling(ROLLING_WINDOW).mean()
+        hist["rvol"] = hist["volume"] / hist["avg_volume"]
+        # Per-bar trading day, session mask and GMT+3 day/hour, computed once per download
+        return hist.join(session_index(hist["datetime"], session_calendar_for(symbol)))
+    else:
+        return pd.DataFrame()
+
+
+def prepare_rvol_frame(df):
+    """Adds parsed GMT+3 datetime, date and hour columns and sorts newest bar first."""
+    df = df.copy()
+    if "datetime" in df:
+        # Bars from load_rvol_data carry UTC datetimes; frames with only datetime_gmt3 strings are parsed
+        df["datetime_gmt3_dt"] = df["datetime"].dt.tz_convert("Etc/GMT-3")
+    else:
+        df["datetime_gmt3_dt"] = pd.to_datetime(df["datetime_gmt3"], errors="coerce")
+    df = df.dropna(subset=["datetime_gmt3_dt"])
+    df = df.sort_values("datetime_gmt3_dt", ascending=False)
+    df["date_gmt3"] = df["datetime_gmt3_dt"].dt.date
+    df["hour_gmt3"] = df["datetime_gmt3_dt"].dt.hour
+    return df
+
+
+def open_rvol_means(df, open_window):
+    """Returns mean rvol over the open window of the latest and previous trading day (None when either is missing).
+
+    The previous trading day is the latest earlier day with session bars, so weekends and holidays are skipped.
+    """
+    if df.empty:
+        return None, None
+    bit = SESSION_WINDOWS[open_window][0]
+    mask = df["session_mask"].to_numpy()
+    days = df["trading_day"].to_numpy()
+    in_window = (mask & (bit | IN_SESSION)) == (bit | IN_SESSION)
+    latest_day = days.max()
+    earlier_days = days[((mask & IN_SESSION) > 0) & (days < latest_day)]
+    if len(earlier_days) == 0:
+        return None, None
+    rvol = df["rvol"].to_numpy()
+    curr_open = rvol[in_window & (days == latest_day)]
+    prev_open = rvol[in_window & (days == earlier_days.max())]
+    if len(curr_open) == 0 or len(prev_open) == 0:
+        return None, None
+    return np.nanmean(curr_open), np.nanmean(prev_open)
+
+
+def detect_gap_up(df, open_window, threshold):
+    curr_mean, prev_mean = open_rvol_means(df, open_window)
+    if curr_mean is None:
+        return False, None, None
+    if prev_mean == 0 or pd.isna(prev_mean):
+        return False, curr_mean, prev_mean
+    gap_ratio = curr_mean / prev_mean
+    return gap_ratio >= threshold, curr_mean, prev_mean
+
+
+def latest_day_frame(df):
+    """Returns the latest GMT+3 date and its bars (hours 0-23) from a prepared frame."""
+    latest_day = df.iloc[0]["date_gmt3"]
+    day_df = df[df["day_gmt3"].to_numpy() == df["day_gmt3"].iloc[0]].copy()
+    return latest_day, day_df
+
+
+def etf_filled_day(etf_df, calendar=CALENDARS["equity_etf"]):
+    """Builds the 24-hour ETF rvol profile for its latest trading day.
+
+    Hours before the scheduled session carry the previous session's last bar, hours after it carry the
+    day's last bar (in summer: 0-15 from the previous 22:00 bar, 16-22 actual, 23 from 22:00).
+    """
+    mask, days = etf_df["session_mask"].to_numpy(), etf_df["trading_day"].to_numpy()
+    in_session = (mask & IN_SESSION) > 0
+    session_days = np.unique(days[in_session])
+    etf_ffill = pd.DataFrame({"hour_gmt3": list(range(24))})
+    if len(session_days) == 0:
+        etf_ffill["rvol"] = np.nan
+        return etf_ffill
+    latest_day = session_days[-1]
+    etf_day_df = etf_df[in_session & (days == latest_day)]
+    etf_ffill = etf_ffill.merge(etf_day_df[["hour_gmt3", "rvol"]].astype({"hour_gmt3": int}), on="hour_gmt3", how="left")
+    hours = scheduled_display_hours(calendar, latest_day)
+    if hours is None:
+        return etf_ffill
+    first_hour, last_hour = hours
+    # Pre-market: previous session's last bar (bars are sorted by time)
+    if len(session_days) > 1:
+        prev_bars = etf_df[in_session & (days == session_days[-2])].sort_values("datetime")
+        etf_ffill.loc[etf_ffill["hour_gmt3"] < first_hour, "rvol"] = prev_bars["rvol"].iloc[-1]
+    # After the close: the day's last bar
+    last_rvol = etf_day_df.sort_values("datetime")["rvol"].dropna()
+    if not last_rvol.empty:
+        etf_ffill.loc[etf_ffill["hour_gmt3"] > last_hour, "rvol"] = last_rvol.iloc[-1]
+    return etf_ffill
+
+
+def sector_rvol_mean(sector_assets, fetch, day):
+    """Mean rvol per GMT+3 hour across the sector's assets on the given day (None when no asset has data)."""
+    day = day_ordinal(day)
+    sector_rvols = []
+    for asset in sector_assets:
+        asset_df = fetch(asset)
+        if asset_df is None or asset_df.empty:
+            continue
+        asset_day_df = asset_df[asset_df["day_gmt3"].to_numpy() == day]
+        if not asset_day_df.empty:
+            sector_rvols.append(asset_day_df.set_index(asset_day_df["hour_gmt3"].astype(int))["rvol"])
+    if not sector_rvols:
+        return None
+    return pd.concat(sector_rvols, axis=1).mean(axis=1).rename_axis("hour_gmt3")
+
+
+def sector_score_history(sector_assets, etf_symbol, fetch):
+    """Builds the 2-year sector score series (all hours, all assets in sector, and ETF)."""
+    # Bars are sorted oldest first by load_rvol_data
+    sector_rvols_2y = []
+    for asset in sector_assets:
+        asset_df_2y = fetch(asset)
+        if asset_df_2y is None or asset_df_2y.empty:
+            continue
+        sector_rvols_2y.append(asset_df_2y["rvol"])
+    if sector_rvols_2y:
+        sector_rvols_2y_all = pd.concat(sector_rvols_2y, axis=0)
+    else:
+        sector_rvols_2y_all = pd.Series(dtype=float)
+    etf_df_2y = fetch(etf_symbol)
+    if etf_df_2y is not None and not etf_df_2y.empty:
+        etf_rvol_2y = etf_df_2y["rvol"]
+    else:
+        etf_rvol_2y = pd.Series(dtype=float)
+    # Calculate sector score for all available hours in 2 years
+    if not sector_rvols_2y_all.empty and not etf_rvol_2y.empty:
+        # Align lengths by truncating to the shortest
+        min_len = min(len(sector_rvols_2y_all), len(etf_rvol_2y))
+        return pd.Series(0.4 * etf_rvol_2y.iloc[:min_len].values + 0.6 * sector_rvols_2y_all.iloc[:min_len].values)
+    elif not sector_rvols_2y_all.empty:
+        return sector_rvols_2y_all
+    elif not etf_rvol_2y.empty:
+        return etf_rvol_2y
+    return pd.Series(dtype=float)
+
+
+def compute_sector_score(symbol, day, fetch, etf_map, asset_to_sector, asset_category_map, percentile=SECTOR_SCORE_PERCENTILE, percentile_index=None):
+    """Computes the hourly sector score for an asset's sector on a day and its percentile line over 2 years.
+
+    Returns a dict with sector, etf_symbol, scores (hour_gmt3/sector_rvol/rvol_etf/sector_score frame),
+    threshold and warning; on failure only warning (and whatever was resolved) is set. With a
+    percentile_index from build_rvol_percentile_index the threshold is an index lookup.
+    """
+    result = {"sector": asset_to_sector.get(symbol), "etf_symbol": None, "scores": None, "threshold": None, "warning": None}
+    etf_info = etf_map.get(symbol)
+    sector = result["sector"]
+    if not sector:
+        result["warning"] = f"No sector found for {symbol} in asset_category_map.json."
+        return result
+    if not etf_info:
+        result["warning"] = f"No ETF mapping found for {symbol}, cannot compute sector score."
+        return result
+    etf_symbol = result["etf_symbol"] = etf_info[0]
+    etf_df = fetch(etf_symbol)
+    if etf_df is None or etf_df.empty:
+        result["warning"] = f"No ETF data found for {etf_symbol} (asset ETF for {symbol})."
+        return result
+    etf_ffill = etf_filled_day(etf_df, session_calendar_for(etf_symbol))
+
+    # --- Calculate mean sector rvol for each hour ---
+    sector_assets = asset_category_map[sector]
+    sector_mean = sector_rvol_mean(sector_assets, fetch, day)
+    if sector_mean is None:
+        result["warning"] = f"No sector rvol data available for sector {sector} on {day}."
+        return result
+    # Merge mean sector rvol and ETF rvol on hour_gmt3 for the day
+    merged = pd.merge(
+        sector_mean.rename("sector_rvol").reset_index(),
+        etf_ffill[["hour_gmt3", "rvol"]].rename(columns={"rvol": "rvol_etf"}),
+        on="hour_gmt3",
+        how="inner"
+    )
+    if merged.empty:
+        result["warning"] = f"No overlapping hourly data for sector {sector} and ETF {etf_symbol} on {day}."
+        return result
+    merged["sector_score"] = 0.4 * merged["rvol_etf"] + 0.6 * merged["sector_rvol"]
+    key = ("sector_score", sector, etf_symbol)
+    if percentile_index is None or key not in percentile_index:
+        percentile_index = SortedPercentiles()
+        percentile_index.add(key, sector_score_history(sector_assets, etf_symbol, fetch))
+    result["scores"] = merged
+    result["threshold"] = percentile_index.percentile(key, percentile) if percentile_index.count(key) else None
+    return result
+
+
+def build_rvol_percentile_index(symbols, fetch, etf_map, asset_to_sector, asset_category_map):
+    """Sorts every symbol's 2-year rvol and every (sector, ETF) 2-year sector score once for percentile lookups.
+
+    Keys are ("rvol", symbol) and ("sector_score", sector, etf_symbol).
+    """
+    index = SortedPercentiles()
+    for symbol in symbols:
+        df = fetch(symbol)
+        if df is not None and not df.empty:
+            index.add(("rvol", symbol), df["rvol"])
+        sector, etf_info = asset_to_sector.get(symbol), etf_map.get(symbol)
+        if sector and etf_info and ("sector_score", sector, etf_info[0]) not in index:
+            index.add(("sector_score", sector, etf_info[0]), sector_score_history(asset_category_map[sector], etf_info[0], fetch))
+    return index
+
+
+def sector_symbols(symbol, etf_map, asset_to_sector, asset_category_map):
+    """Symbols whose bars the sector score of symbol reads: the sector's assets and the asset's ETF."""
+    sector, etf_info = asset_to_sector.get(symbol), etf_map.get(symbol)
+    return list(asset_category_map.get(sector, [])) + ([etf_info[0]] if etf_info else [])
+
+
+def rvol_panel(frames):
+    """Hourly rvol of every symbol aligned on UTC hours (hour x symbol), for cross-asset correlation."""
+    series = {}
+    for symbol, df in frames.items():
+        if df is None or df.empty:
+            continue
+        # ETF bars start at :30, futures at :00; both map to the hour they start in
+        series[symbol] = df.groupby(df["datetime"].dt.floor("h"))["rvol"].last()
+    return pd.DataFrame(series).sort_index()
+
+
+# --- Computation graph nodes: results are memoized by input content, so reruns only recompute what changed ---
+
+def raw_bars_nodes(graph, fetch):
+    """Returns symbol -> content-hashed raw bars Ref, fetching and hashing each symbol once."""
+    refs = {}
+
+    def bars(symbol):
+        if symbol not in refs:
+            refs[symbol] = graph.source("raw_bars", fetch(symbol))
+        return refs[symbol]
+    return bars
+
+
+def rvol_percentile_index_node(graph, symbols, bars, etf_map, asset_to_sector, asset_category_map):
+    """build_rvol_percentile_index as a graph node over every symbol's (and sector's) raw bars."""
+    needed = set(symbols).union(*(sector_symbols(s, etf_map, asset_to_sector, asset_category_map) for s in symbols))
+    return graph.node(
+        "rvol_percentile_index",
+        lambda frames, symbols: build_rvol_percentile_index(symbols, frames.get, etf_map, asset_to_sector, asset_category_map),
+        {s: bars(s) for s in sorted(needed)}, list(symbols),
+    )
+
+
+def sector_score_node(graph, symbol, day, bars, etf_map, asset_to_sector, asset_category_map, percentile=SECTOR_SCORE_PERCENTILE, percentile_index=None):
+    """compute_sector_score as a graph node over the bars of the asset's sector and ETF."""
+    frames = {s: bars(s) for s in sector_symbols(symbol, etf_map, asset_to_sector, asset_category_map)}
+    return graph.node(
+        "sector_score",
+        lambda frames, symbol, day, percentile, index: compute_sector_score(symbol, day, frames.get, etf_map, asset_to_sector, asset_category_map, percentile, index),
+        frames, symbol, day, percentile, percentile_index,
+    )
+
+
+def rvol_stats(df, symbol, percentile, percentile_index=None):
+    """Latest rvol, its percentile rank and the percentile line over the series (None without rvol)."""
+    rvol = df["rvol"].dropna()
+    if rvol.empty:
+        return None
+    key = ("rvol", symbol)
+    if percentile_index is None or key not in percentile_index:
+        percentile_index = SortedPercentiles()
+        percentile_index.add(key, rvol)
+    latest = rvol.iloc[-1]
+    return latest, percentile_index.rank(key, latest), percentile_index.percentile(key, percentile)
+
+
+def build_rvol_feature_matrix(symbols, fetch, open_window, features=None, etf_map=None, asset_to_sector=None, asset_category_map=None,
+                              rvol_percentile=RVOL_PERCENTILE, sector_percentile=SECTOR_SCORE_PERCENTILE, percentile_index=None,
+                              graph=None, bars=None):
+    """Builds an asset x feature matrix for the screener.
+
+    Only the feature groups named in `features` (default: all) are computed; sector features need the
+    ETF/sector maps. rvol_threshold and sector_score_threshold are the rvol_percentile / sector_percentile
+    lines, looked up in percentile_index (an index or its graph Ref) when given. Missing values are NaN,
+    which never pass a screen condition. With a persistent `graph` (and its `bars` from raw_bars_nodes)
+    per-symbol results are reused across calls and only nodes whose inputs changed are recomputed.
+    """
+    wanted = set(features) if features is not None else set(GAP_FEATURES + RVOL_FEATURES + SECTOR_FEATURES)
+    need_gap = bool(wanted & set(GAP_FEATURES))
+    need_rvol = bool(wanted & set(RVOL_FEATURES))
+    need_sector = bool(wanted & set(SECTOR_FEATURES)) and etf_map is not None
+    graph = graph or ComputeGraph()
+    bars = bars or raw_bars_nodes(graph, fetch)
+    if percentile_index is not None and not isinstance(percentile_index, Ref):
+        percentile_index = graph.source("rvol_percentile_index", percentile_index)
+
+    columns = GAP_FEATURES + RVOL_FEATURES + SECTOR_FEATURES
+    matrix = pd.DataFrame(np.nan, index=pd.Index(symbols, name="symbol"), columns=columns)
+    for symbol in symbols:
+        raw = bars(symbol)
+        if raw.value is None or raw.value.empty:
+            continue
+        if need_gap:
+            curr_mean, prev_mean = graph.node("session_means", open_rvol_means, raw, open_window).value
+            if curr_mean is not None:
+                matrix.at[symbol, "curr_open_rvol"] = curr_mean
+                matrix.at[symbol, "prev_open_rvol"] = prev_mean
+                if prev_mean and not pd.isna(prev_mean):
+                    matrix.at[symbol, "gap_ratio"] = curr_mean / prev_mean
+        if need_rvol:
+            stats = graph.node("rvol_stats", rvol_stats, raw, symbol, rvol_percentile, percentile_index).value
+            if stats is not None:
+                matrix.at[symbol, "rvol_latest"], matrix.at[symbol, "rvol_percentile"], matrix.at[symbol, "rvol_threshold"] = stats
+        if need_sector:
+            prepared = graph.node("prepared_frame", prepare_rvol_frame, raw).value
+            if prepared.empty:
+                continue
+            latest_day, _ = latest_day_frame(prepared)
+            sector = sector_score_node(graph, symbol, latest_day, bars, etf_map, asset_to_sector, asset_category_map, sector_percentile, percentile_index).value
+            if sector["scores"] is not None:
+                matrix.at[symbol, "sector_score"] = sector["scores"].sort_values("hour_gmt3")["sector_score"].iloc[-1]
+                if sector["threshold"] is not None:
+                    matrix.at[symbol, "sector_score_threshold"] = sector["threshold"]
+    return matrix
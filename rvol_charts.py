@@ -0,0 +1,126 @@
+import numpy as np
+import plotly.graph_objs as go
+from plotly.subplots import make_subplots
+
+# Hour-of-day x axis shared by the day charts
+HOUR_AXIS = dict(tickmode='array', tickvals=list(range(24)), ticktext=[str(h) for h in range(24)])
+
+# Points sent to the browser for a long history line (2 years of hourly bars is ~12k points)
+HISTORY_MAX_POINTS = 1000
+
+# Height of one asset row in the compact grid
+GRID_ROW_HEIGHT = 180
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets downsampling: returns the indices of `threshold` points that keep the line's shape.
+
+    The first and last points are always kept; each bucket in between keeps the point forming the
+    largest triangle with the previously kept point and the mean of the next bucket. NaN y values are dropped.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = np.flatnonzero(~np.isnan(y))
+    n = len(valid)
+    if threshold >= n or threshold < 3:
+        return valid
+    x, y = x[valid], y[valid]
+    # Bucket edges over the points between the first and the last one
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        next_x, next_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        # Twice the triangle area; the constant factor does not change the argmax
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous]) - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return valid[selected]
+
+
+def rvol_day_figure(title, hours, rvol, rvol_line, percentile):
+    """Bar chart of one day's hourly rvol with the 2-year percentile line."""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=hours, y=rvol, name="RVol", marker_color="blue"))
+    fig.add_hline(y=rvol_line, line_width=3, line_dash="dash", line_color="red", annotation_text=f"{percentile}th percentile", annotation_position="top right")
+    fig.update_layout(
+        title=title,
+        xaxis_title="Hour of Day (GMT+3)",
+        yaxis_title="RVol",
+        xaxis=HOUR_AXIS,
+        yaxis=dict(rangemode="tozero"),
+        height=300
+    )
+    return fig
+
+
+def sector_day_figure(title, hours, scores, sector_line, percentile):
+    """Bar chart of one day's hourly sector score with the 2-year percentile line (when available)."""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=hours, y=scores, name="Sector Score", marker_color="orange"))
+    if sector_line is not None:
+        fig.add_hline(y=sector_line, line_width=3, line_dash="dash", line_color="purple", annotation_text=f"{percentile}th percentile (2y)", annotation_position="top right")
+    fig.update_layout(
+        title=title,
+        xaxis_title="Hour of Day (GMT+3)",
+        yaxis_title="Sector Score",
+        xaxis=HOUR_AXIS,
+        yaxis=dict(rangemode="tozero"),
+        height=300
+    )
+    return fig
+
+
+def rvol_history_figure(title, datetimes, rvol, rvol_line, percentile, max_points=HISTORY_MAX_POINTS):
+    """WebGL line of the full rvol history, LTTB-downsampled to max_points, with the percentile line."""
+    keep = lttb(np.arange(len(rvol)), rvol, max_points)
+    datetimes, rvol = np.asarray(datetimes)[keep], np.asarray(rvol, dtype=float)[keep]
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(x=datetimes, y=rvol, mode="lines", name="RVol", line=dict(color="blue", width=1)))
+    if len(datetimes):
+        fig.add_trace(go.Scattergl(x=[datetimes[0], datetimes[-1]], y=[rvol_line, rvol_line], mode="lines", name=f"{percentile}th percentile",
+                                   line=dict(color="red", width=2, dash="dash")))
+    fig.update_layout(
+        title=title,
+        xaxis_title="Time (GMT+3)",
+        yaxis_title="RVol",
+        yaxis=dict(rangemode="tozero"),
+        showlegend=False,
+        height=300
+    )
+    return fig
+
+
+def compact_grid_figure(panels, rvol_percentile, sector_percentile):
+    """All passing assets in one subplot figure: a row per asset with rvol and sector score, drawn with WebGL traces.
+
+    Each panel is a dict with title, hours, rvol, rvol_line and, when available, sector_title,
+    sector_hours, sector_scores and sector_line. Percentile lines are two-point traces, not shapes.
+    """
+    rows = max(len(panels), 1)
+    titles = [t for p in panels for t in (p["title"], p.get("sector_title") or "")]
+    fig = make_subplots(rows=rows, cols=2, subplot_titles=titles, vertical_spacing=min(0.08, 0.4 / rows), horizontal_spacing=0.06)
+    for row, panel in enumerate(panels, start=1):
+        for col, (hours, values, line, color, line_color) in enumerate((
+            (panel["hours"], panel["rvol"], panel["rvol_line"], "blue", "red"),
+            (panel.get("sector_hours"), panel.get("sector_scores"), panel.get("sector_line"), "orange", "purple"),
+        ), start=1):
+            if hours is None:
+                continue
+            fig.add_trace(go.Scattergl(x=hours, y=values, mode="lines+markers", line=dict(color=color, shape="hvh", width=1),
+                                       marker=dict(size=3), fill="tozeroy"), row=row, col=col)
+            if line is not None:
+                fig.add_trace(go.Scattergl(x=[0, 23], y=[line, line], mode="lines", line=dict(color=line_color, dash="dash", width=2),
+                                           hoverinfo="skip"), row=row, col=col)
+    fig.update_xaxes(range=[-0.5, 23.5], tickvals=list(range(0, 24, 3)))
+    fig.update_yaxes(rangemode="tozero")
+    fig.update_layout(
+        title=f"RVol ({rvol_percentile}th percentile) and Sector Score ({sector_percentile}th percentile) — hour of day (GMT+3)",
+        showlegend=False,
+        height=GRID_ROW_HEIGHT * rows + 80,
+        margin=dict(l=40, r=20, t=80, b=30)
+    )
+    return fig
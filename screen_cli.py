@@ -0,0 +1,320 @@
+"""Headless COT and RVol screens for cron jobs and workers.
+
+Examples:
+    python screen_cli.py cot --percentile 40 --cot-filters noncomm:long,comm:short
+    python screen_cli.py rvol --market-open NY --gap-threshold 1.5 --format csv --output alerts.csv
+    python screen_cli.py all --webhook https://example.com/hook --fail-on-alert
+
+--screen is applied to each selected screen that has every feature it references (in `all` mode an
+expression over COT features only filters the COT screen); --cot-screen / --rvol-screen target one screen.
+
+Exit codes, highest precedence first: 1 = alerts raised with --fail-on-alert, 2 = error,
+3 = ran, but some assets or symbols could not be fetched (listed under fetch_errors in the JSON report),
+0 = ran (alerts or not).
+"""
+import sys
+import json
+import time
+import argparse
+import logging
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import requests
+
+import postgres_client
+import cot_analysis
+import rvol_analysis
+from screener import F, all_of, any_of, parse_screen, evaluate_screen
+from supabase_client import get_shared_supabase_client
+from compute_graph import get_compute_graph
+from session_calendar import SESSION_WINDOWS
+
+EXIT_OK = 0
+EXIT_ALERTS = 1
+EXIT_ERROR = 2
+EXIT_FETCH_ERRORS = 3
+
+WEBHOOK_TIMEOUT = 10
+
+# Feature columns of each screen's matrix, for routing the shared --screen expression
+SCREEN_FEATURES = {
+    "cot": set(cot_analysis.COT_FEATURES),
+    "rvol": set(rvol_analysis.GAP_FEATURES + rvol_analysis.RVOL_FEATURES + rvol_analysis.SECTOR_FEATURES),
+}
+
+
+class Timer:
+    """Collects wall-clock seconds per named step."""
+
+    def __init__(self):
+        self.steps = {}
+
+    def step(self, name):
+        return _TimedStep(self, name)
+
+
+class _TimedStep:
+    def __init__(self, timer, name):
+        self.timer, self.name = timer, name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.timer.steps[self.name] = self.timer.steps.get(self.name, 0.0) + time.perf_counter() - self.started
+
+
+def _value(value):
+    """Converts numpy scalars and NaN into JSON-friendly values."""
+    if value is None:
+        return None
+    value = value.item() if isinstance(value, np.generic) else value
+    return None if isinstance(value, float) and np.isnan(value) else value
+
+
+def _records(matrix, passing, index_name):
+    """Asset x feature matrix as a list of dicts with a `passed` flag."""
+    frame = matrix.copy()
+    frame.insert(0, "passed", passing.reindex(frame.index).fillna(False).astype(bool))
+    frame.index.name = index_name
+    return [{k: _value(v) for k, v in row.items()} for row in frame.reset_index().to_dict(orient="records")]
+
+
+def tracking_fetch(fetch, screen, fetch_errors):
+    """Wraps a per-symbol fetch so failures and empty downloads are recorded in fetch_errors instead of dropping the symbol silently."""
+    def wrapped(symbol):
+        try:
+            df = fetch(symbol)
+        except Exception as e:
+            df, error = pd.DataFrame(), str(e)
+        else:
+            error = "no data returned" if df is None or df.empty else None
+        if error is not None and not any(e["asset"] == symbol for e in fetch_errors):
+            logging.warning(f"{screen}: no bars for {symbol} ({error})")
+            fetch_errors.append({"screen": screen, "asset": symbol, "error": error})
+        return df
+    return wrapped
+
+
+def screen_targets(args):
+    """Screens the shared --screen expression applies to: those having every feature it references."""
+    if not args.screen:
+        return set()
+    features = parse_screen(args.screen).features()
+    modes = ["cot", "rvol"] if args.mode == "all" else [args.mode]
+    targets = {mode for mode in modes if features <= SCREEN_FEATURES[mode]}
+    if not targets:
+        raise ValueError(f"--screen references features that no selected screen has: {sorted(features)}")
+    return targets
+
+
+def extra_screens(args, mode, own_screen):
+    """The shared --screen (when it targets this screen) and the screen's own expression, parsed."""
+    texts = ([args.screen] if mode in screen_targets(args) else []) + ([own_screen] if own_screen else [])
+    return [parse_screen(text) for text in texts]
+
+
+# --- COT screen ---
+
+def parse_cot_filters(text):
+    """Parses 'noncomm:long,comm:short' into screen conditions (empty text means no filters)."""
+    known = {(category, direction) for _, category, direction in cot_analysis.COT_FILTERS}
+    conditions = []
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        category, _, direction = item.partition(":")
+        if (category, direction) not in known:
+            raise ValueError(f"Unknown COT filter '{item}'; expected one of {sorted(f'{c}:{d}' for c, d in known)}")
+        conditions.append(cot_analysis.cot_significant_change(category, direction))
+    return conditions
+
+
+def cot_alerts(matrix):
+    """One alert per asset, trader group and direction whose latest change crosses its threshold."""
+    alerts = []
+    for _, category, direction in cot_analysis.COT_FILTERS:
+        fired = evaluate_screen(matrix, (F("has_recent_reports") > 0) & cot_analysis.cot_significant_change(category, direction))
+        threshold_column = f"{category}_pos_threshold" if direction == "long" else f"{category}_neg_threshold"
+        for asset_name in matrix.index[fired.to_numpy()]:
+            alerts.append({
+                "screen": "cot",
+                "asset": asset_name,
+                "signal": f"cot_{category}_{direction}",
+                "value": _value(matrix.at[asset_name, f"{category}_change"]),
+                "threshold": _value(matrix.at[asset_name, threshold_column]),
+            })
+    return alerts
+
+
+def run_cot_screen(args, timer, fetch_errors):
+    """Runs the COT significant-change screen; returns (results, alerts). Assets without a latest change are appended to fetch_errors."""
+    supabase_client = None
+    if not postgres_client.use_postgres_backend():
+        supabase_client = get_shared_supabase_client()
+        if not supabase_client:
+            raise RuntimeError("Failed to initialize Supabase client.")
+
+    latest_changes_by_asset = None
+    with timer.step("cot_fetch"):
+        if args.db_analytics:
+            compact_rows = cot_analysis.fetch_compact_cot_analytics(supabase_client, tuple(cot_analysis.TARGET_ASSETS), percentile=args.percentile / 100)
+            if compact_rows is None:
+                logging.warning("In-database analytics unavailable, falling back to client-side calculation.")
+            else:
+                thresholds, latest_changes_by_asset = cot_analysis.parse_compact_cot_analytics(compact_rows)
+                failures = {asset_name: "no latest change in compact analytics" for asset_name in cot_analysis.TARGET_ASSETS if asset_name not in latest_changes_by_asset}
+        if latest_changes_by_asset is None:
+            thresholds = cot_analysis.calculate_asset_thresholds(supabase_client, args.percentile)
+            failures = {}
+            latest_changes_by_asset = cot_analysis.fetch_latest_changes(supabase_client, failures)
+    for asset_name, error in failures.items():
+        logging.warning(f"cot: no latest change for {asset_name} ({error})")
+        fetch_errors.append({"screen": "cot", "asset": asset_name, "error": error})
+
+    with timer.step("cot_screen"):
+        matrix = cot_analysis.build_cot_feature_matrix(latest_changes_by_asset, thresholds)
+        filters = parse_cot_filters(args.cot_filters)
+        combined = all_of(filters) if args.combine == "and" else any_of(filters)
+        screen_parts = [F("has_recent_reports") > 0] + ([combined] if combined is not None else []) + extra_screens(args, "cot", args.cot_screen)
+        passing = evaluate_screen(matrix, all_of(screen_parts))
+        alerts = cot_alerts(matrix)
+    logging.info(f"COT: {int(passing.sum())} of {len(passing)} assets passed the screen, {len(alerts)} alerts.")
+    return _records(matrix, passing, "asset"), alerts
+
+
+# --- RVol screen ---
+
+def rvol_alerts(matrix, gap_threshold):
+    """Gap-up alerts (open-window rvol ratio >= gap_threshold) and sector score alerts (latest score above its percentile line)."""
+    alerts = []
+    for signal, expr, value_column, threshold in (
+        ("gap_up", F("gap_ratio") >= gap_threshold, "gap_ratio", None),
+        ("sector_score", F("sector_score") > F("sector_score_threshold"), "sector_score", "sector_score_threshold"),
+    ):
+        fired = evaluate_screen(matrix, expr)
+        for symbol in matrix.index[fired.to_numpy()]:
+            alerts.append({
+                "screen": "rvol",
+                "asset": symbol,
+                "signal": signal,
+                "value": _value(matrix.at[symbol, value_column]),
+                "threshold": gap_threshold if threshold is None else _value(matrix.at[symbol, threshold]),
+            })
+    return alerts
+
+
+def run_rvol_screen(args, timer, fetch_errors):
+    """Runs the gap-up / sector-score screen; returns (results, alerts). Symbols that fail to fetch are appended to fetch_errors."""
+    symbols = args.symbols.split(",") if args.symbols else rvol_analysis.asset_symbols
+    # Sector scores also read the sector's other assets and the ETF
+    sector_inputs = set().union(*(rvol_analysis.sector_symbols(s, rvol_analysis.ETF_MAP, rvol_analysis.ASSET_TO_SECTOR, rvol_analysis.ASSET_CATEGORY_MAP) for s in symbols))
+
+    with timer.step("rvol_fetch"):
+        rvol_analysis.prefetch_rvol_histories(set(symbols) | sector_inputs)
+        # Each history is processed and hashed once; every node below reuses it
+        graph = get_compute_graph()
+        fetch = tracking_fetch(rvol_analysis.load_rvol_data, "rvol", fetch_errors)
+        bars = rvol_analysis.raw_bars_nodes(graph, fetch)
+
+    with timer.step("rvol_screen"):
+        percentile_index = rvol_analysis.rvol_percentile_index_node(
+            graph, symbols, bars, rvol_analysis.ETF_MAP, rvol_analysis.ASSET_TO_SECTOR, rvol_analysis.ASSET_CATEGORY_MAP
+        )
+        matrix = rvol_analysis.build_rvol_feature_matrix(
+            symbols, fetch, args.market_open,
+            etf_map=rvol_analysis.ETF_MAP, asset_to_sector=rvol_analysis.ASSET_TO_SECTOR, asset_category_map=rvol_analysis.ASSET_CATEGORY_MAP,
+            rvol_percentile=args.rvol_percentile, sector_percentile=args.sector_percentile, percentile_index=percentile_index,
+            graph=graph, bars=bars
+        )
+        screen = all_of([F("gap_ratio") >= args.gap_threshold] + extra_screens(args, "rvol", args.rvol_screen))
+        passing = evaluate_screen(matrix, screen)
+        alerts = rvol_alerts(matrix, args.gap_threshold)
+    logging.info(f"RVol: {int(passing.sum())} of {len(passing)} symbols passed the screen, {len(alerts)} alerts.")
+    return _records(matrix, passing, "symbol"), alerts
+
+
+# --- Output ---
+
+def write_output(report, args):
+    """Writes the report as JSON, or the alerts/results table as CSV, to --output or stdout."""
+    if args.format == "json":
+        text = json.dumps(report, indent=2, default=str)
+    else:
+        if args.table == "alerts":
+            rows = report["alerts"]
+        else:
+            rows = [dict(row, screen=screen) for screen, result in report["results"].items() for row in result]
+        text = pd.DataFrame(rows).to_csv(index=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text if text.endswith("\n") else text + "\n")
+
+
+def post_webhook(url, report):
+    """Posts the alerts to a webhook as JSON (payload: generated_at, alerts)."""
+    response = requests.post(url, json={"generated_at": report["generated_at"], "alerts": report["alerts"]}, timeout=WEBHOOK_TIMEOUT)
+    response.raise_for_status()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run the COT and RVol screens without Streamlit.")
+    parser.add_argument("mode", choices=["cot", "rvol", "all"], help="Which screens to run.")
+    parser.add_argument("--format", choices=["json", "csv"], default="json")
+    parser.add_argument("--table", choices=["alerts", "results"], default="alerts", help="Table written in CSV format.")
+    parser.add_argument("--output", help="Write to this file instead of stdout.")
+    parser.add_argument("--webhook", help="POST alerts as JSON to this URL when any are raised.")
+    parser.add_argument("--fail-on-alert", action="store_true", help="Exit with code 1 when any alert is raised.")
+    parser.add_argument("--screen", help="Extra screen expression, AND-ed with each selected screen that has all the features it references.")
+    cot = parser.add_argument_group("COT screen")
+    cot.add_argument("--percentile", type=int, default=cot_analysis.COT_PERCENTILE, help="Threshold percentile of the last 52 reports.")
+    cot.add_argument("--cot-filters", default="", help="Comma-separated category:direction filters, e.g. noncomm:long,comm:short.")
+    cot.add_argument("--combine", choices=["and", "or"], default="and", help="How --cot-filters are combined.")
+    cot.add_argument("--db-analytics", action=argparse.BooleanOptionalAction, default=cot_analysis.USE_DB_ANALYTICS,
+                     help="Use the in-database compact analytics rows (default from COT_USE_DB_ANALYTICS).")
+    cot.add_argument("--cot-screen", help="Extra screen expression for the COT screen only.")
+    rvol = parser.add_argument_group("RVol screen")
+    rvol.add_argument("--market-open", choices=list(SESSION_WINDOWS), default="NY", help="Open window of the gap-up screen.")
+    rvol.add_argument("--gap-threshold", type=float, default=1.5)
+    rvol.add_argument("--rvol-percentile", type=int, default=rvol_analysis.RVOL_PERCENTILE)
+    rvol.add_argument("--sector-percentile", type=int, default=rvol_analysis.SECTOR_SCORE_PERCENTILE)
+    rvol.add_argument("--symbols", help="Comma-separated Yahoo symbols (default: the dashboard universe).")
+    rvol.add_argument("--rvol-screen", help="Extra screen expression for the RVol screen only.")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    timer = Timer()
+    started = time.perf_counter()
+    report = {"generated_at": datetime.now(timezone.utc).isoformat(), "results": {}, "alerts": [], "fetch_errors": []}
+    try:
+        if args.mode in ("cot", "all"):
+            report["results"]["cot"], alerts = run_cot_screen(args, timer, report["fetch_errors"])
+            report["alerts"].extend(alerts)
+        if args.mode in ("rvol", "all"):
+            report["results"]["rvol"], alerts = run_rvol_screen(args, timer, report["fetch_errors"])
+            report["alerts"].extend(alerts)
+        report["timing"] = {name: round(seconds, 3) for name, seconds in timer.steps.items()}
+        write_output(report, args)
+        if args.webhook and report["alerts"]:
+            with timer.step("webhook"):
+                post_webhook(args.webhook, report)
+    except Exception as e:
+        logging.error(f"Screen run failed: {e}")
+        return EXIT_ERROR
+
+    # Timing goes to stderr so stdout stays machine-readable
+    timing = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timer.steps.items())
+    print(f"{len(report['alerts'])} alerts, {len(report['fetch_errors'])} fetch errors in {time.perf_counter() - started:.2f}s ({timing})", file=sys.stderr)
+    # Alerts win over fetch errors so --fail-on-alert keeps its signal; fetch errors are also in the report
+    if args.fail_on_alert and report["alerts"]:
+        return EXIT_ALERTS
+    return EXIT_FETCH_ERRORS if report["fetch_errors"] else EXIT_OK
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s", stream=sys.stderr)
+    sys.exit(main())
@@ -0,0 +1,278 @@
+import ast
+import operator
+from abc import ABC, abstractmethod
+
+import numpy as np
+import pandas as pd
+
+# Comparison operators supported in screen conditions
+COMPARISONS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+class Expr(ABC):
+    """Base class of screen expressions; combine with & (AND), | (OR) and ~ (NOT).
+
+    Evaluation is three-valued: a comparison on a missing (NaN) value is unknown rather than false,
+    AND / OR / NOT follow Kleene logic, and only rows that are known to be true pass. So `not x > 2`
+    does not pass a row whose x is missing.
+    """
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+    @abstractmethod
+    def features(self):
+        """Returns the set of feature names the expression reads."""
+
+    @abstractmethod
+    def _compile(self, column_index):
+        """Returns a function mapping the (assets x features) value array to (true, known) boolean masks."""
+
+
+class Feature:
+    """A feature column reference (optionally scaled), used on either side of a comparison."""
+
+    def __init__(self, name, scale=1.0):
+        self.name = name
+        self.scale = scale
+
+    def __neg__(self):
+        return Feature(self.name, -self.scale)
+
+    def __mul__(self, factor):
+        return Feature(self.name, self.scale * factor)
+
+    __rmul__ = __mul__
+
+    def _compare(self, op, other):
+        return Condition(self, op, other)
+
+    def __gt__(self, other):
+        return self._compare(">", other)
+
+    def __ge__(self, other):
+        return self._compare(">=", other)
+
+    def __lt__(self, other):
+        return self._compare("<", other)
+
+    def __le__(self, other):
+        return self._compare("<=", other)
+
+    def __eq__(self, other):
+        return self._compare("==", other)
+
+    def __ne__(self, other):
+        return self._compare("!=", other)
+
+    __hash__ = object.__hash__
+
+    def __repr__(self):
+        return self.name if self.scale == 1.0 else f"{self.scale:g}*{self.name}"
+
+
+F = Feature
+
+
+def _operand(value, column_index):
+    """Compiles a Feature or a constant into a function of the value array (NaN marks a missing value)."""
+    if isinstance(value, Feature):
+        idx, scale = column_index[value.name], value.scale
+        if scale == 1.0:
+            return lambda values: values[:, idx]
+        return lambda values: values[:, idx] * scale
+    constant = float(value)
+    return lambda values: constant
+
+
+class Condition(Expr):
+    """A single comparison between a feature and a constant or another feature. A comparison with NaN is unknown."""
+
+    def __init__(self, left, op, right):
+        if op not in COMPARISONS:
+            raise ValueError(f"Unsupported comparison operator: {op}")
+        self.left, self.op, self.right = left, op, right
+
+    def features(self):
+        return {side.name for side in (self.left, self.right) if isinstance(side, Feature)}
+
+    def _compile(self, column_index):
+        left, right, compare = _operand(self.left, column_index), _operand(self.right, column_index), COMPARISONS[self.op]
+
+        def evaluate(values):
+            a, b = left(values), right(values)
+            known = np.broadcast_to(~np.isnan(a) & ~np.isnan(b), (len(values),))
+            return compare(a, b) & known, known
+        return evaluate
+
+    def __repr__(self):
+        return f"({self.left!r} {self.op} {self.right!r})"
+
+
+class And(Expr):
+    def __init__(self, *parts):
+        self.parts = parts
+
+    def features(self):
+        return set().union(*(p.features() for p in self.parts))
+
+    def _compile(self, column_index):
+        compiled = [p._compile(column_index) for p in self.parts]
+
+        def evaluate(values):
+            if not compiled:
+                return np.ones(len(values), dtype=bool), np.ones(len(values), dtype=bool)
+            results = [c(values) for c in compiled]
+            true = np.logical_and.reduce([t for t, _ in results])
+            # Known when every part is known, or when any part is known to be false
+            known = np.logical_and.reduce([k for _, k in results]) | np.logical_or.reduce([k & ~t for t, k in results])
+            return true, known
+        return evaluate
+
+    def __repr__(self):
+        return "(" + " AND ".join(map(repr, self.parts)) + ")"
+
+
+class Or(Expr):
+    def __init__(self, *parts):
+        self.parts = parts
+
+    def features(self):
+        return set().union(*(p.features() for p in self.parts))
+
+    def _compile(self, column_index):
+        compiled = [p._compile(column_index) for p in self.parts]
+
+        def evaluate(values):
+            if not compiled:
+                return np.zeros(len(values), dtype=bool), np.ones(len(values), dtype=bool)
+            results = [c(values) for c in compiled]
+            true = np.logical_or.reduce([t for t, _ in results])
+            # Known when every part is known, or when any part is known to be true
+            known = np.logical_and.reduce([k for _, k in results]) | true
+            return true, known
+        return evaluate
+
+    def __repr__(self):
+        return "(" + " OR ".join(map(repr, self.parts)) + ")"
+
+
+class Not(Expr):
+    def __init__(self, part):
+        self.part = part
+
+    def features(self):
+        return self.part.features()
+
+    def _compile(self, column_index):
+        compiled = self.part._compile(column_index)
+
+        def evaluate(values):
+            true, known = compiled(values)
+            # NOT of an unknown stays unknown, so a missing value does not turn into a pass
+            return known & ~true, known
+        return evaluate
+
+    def __repr__(self):
+        return f"NOT {self.part!r}"
+
+
+def all_of(exprs):
+    """ANDs a list of expressions (None when the list is empty)."""
+    exprs = list(exprs)
+    return And(*exprs) if exprs else None
+
+
+def any_of(exprs):
+    """ORs a list of expressions (None when the list is empty)."""
+    exprs = list(exprs)
+    return Or(*exprs) if exprs else None
+
+
+# --- Text conditions, e.g. "gap_ratio >= 1.5 and not (rvol_percentile < 70 or sector_score <= sector_score_threshold)" ---
+
+_AST_COMPARISONS = {ast.Gt: ">", ast.GtE: ">=", ast.Lt: "<", ast.LtE: "<=", ast.Eq: "==", ast.NotEq: "!="}
+
+
+def _parse_operand(node):
+    if isinstance(node, ast.Name):
+        return Feature(node.id)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        operand = _parse_operand(node.operand)
+        return -operand if isinstance(node.op, ast.USub) else operand
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mult):
+        left, right = _parse_operand(node.left), _parse_operand(node.right)
+        if isinstance(left, Feature) and not isinstance(right, Feature):
+            return left * right
+        if isinstance(right, Feature) and not isinstance(left, Feature):
+            return right * left
+    raise ValueError(f"Unsupported operand in screen expression: {ast.dump(node)}")
+
+
+def _parse_node(node):
+    if isinstance(node, ast.BoolOp):
+        parts = [_parse_node(v) for v in node.values]
+        return And(*parts) if isinstance(node.op, ast.And) else Or(*parts)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        return Not(_parse_node(node.operand))
+    if isinstance(node, ast.Compare):
+        # Chained comparisons (a < b < c) become ANDs of pairwise comparisons
+        operands = [_parse_operand(node.left)] + [_parse_operand(c) for c in node.comparators]
+        conditions = []
+        for left, op, right in zip(operands, node.ops, operands[1:]):
+            if type(op) not in _AST_COMPARISONS:
+                raise ValueError(f"Unsupported comparison in screen expression: {type(op).__name__}")
+            if not isinstance(left, Feature):
+                # Keep the feature on the left: 1.5 <= x  ->  x >= 1.5
+                left, right, op = right, left, {ast.Gt: ast.Lt(), ast.GtE: ast.LtE(), ast.Lt: ast.Gt(), ast.LtE: ast.GtE()}.get(type(op), op)
+            conditions.append(Condition(left, _AST_COMPARISONS[type(op)], right))
+        return conditions[0] if len(conditions) == 1 else And(*conditions)
+    raise ValueError(f"Unsupported construct in screen expression: {ast.dump(node)}")
+
+
+def parse_screen(text):
+    """Parses a text condition using and/or/not, comparisons, feature names and numbers."""
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid screen expression: {e}") from e
+    return _parse_node(tree.body)
+
+
+# --- Evaluation ---
+
+def compile_screen(expr, columns):
+    """Compiles an expression against a feature column order; the result maps a value array to a boolean mask
+    (rows whose outcome is unknown because of missing values do not pass)."""
+    column_index = {name: i for i, name in enumerate(columns)}
+    missing = expr.features() - column_index.keys()
+    if missing:
+        raise KeyError(f"Screen references unknown features: {sorted(missing)}")
+    compiled = expr._compile(column_index)
+    return lambda values: compiled(values)[0]
+
+
+def evaluate_screen(matrix, expr):
+    """Evaluates an expression over an asset x feature DataFrame in one pass; returns a boolean Series by asset."""
+    if expr is None:
+        return pd.Series(True, index=matrix.index)
+    mask_fn = compile_screen(expr, matrix.columns)
+    values = matrix.to_numpy(dtype=float, na_value=np.nan)
+    with np.errstate(invalid="ignore"):
+        mask = np.asarray(mask_fn(values), dtype=bool)
+    return pd.Series(np.broadcast_to(mask, (len(matrix),)), index=matrix.index)
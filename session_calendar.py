@@ -0,0 +1,181 @@
+from dataclasses import dataclass
+from datetime import date, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+EPOCH = date(1970, 1, 1)
+
+# session_mask bits: the bar is inside its exchange's regular session on a trading day ...
+IN_SESSION = 1
+# ... and/or inside a regional open window, given as (bit, timezone, local start hour, hours).
+# Local times follow DST; in summer these are the GMT+3 hours 3-4 (Asian), 10-11 (London) and 16-17 (NY).
+SESSION_WINDOWS = {
+    "Asian": (2, "Asia/Tokyo", 9, 2),
+    "London": (4, "Europe/London", 8, 2),
+    "NY": (8, "America/New_York", 9, 2),
+}
+
+
+def day_ordinal(day):
+    """Days since 1970-01-01, the integer form of trading_day / day_gmt3."""
+    return (day - EPOCH).days
+
+
+def ordinal_day(ordinal):
+    return EPOCH + timedelta(days=int(ordinal))
+
+
+def _observed(day):
+    """Holidays on a Saturday are observed on Friday, on a Sunday on Monday."""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def _nth_weekday(year, month, weekday, n):
+    """n-th (1-based, -1 for last) given weekday of a month."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + (month == 12), month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year):
+    """Gregorian Easter Sunday (anonymous algorithm)."""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    month = (h + l - 7 * m + 90) // 25
+    return date(year, month, (h + l - 7 * m + 33 * month + 19) % 32)
+
+
+@lru_cache(maxsize=None)
+def nyse_holidays(year):
+    """NYSE full-day closures for a year."""
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),               # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),               # Washington's Birthday
+        _easter(year) - timedelta(days=2),         # Good Friday
+        _nth_weekday(year, 5, 0, -1),              # Memorial Day
+        _observed(date(year, 7, 4)),               # Independence Day
+        _nth_weekday(year, 9, 0, 1),               # Labor Day
+        _nth_weekday(year, 11, 3, 4),              # Thanksgiving
+        _observed(date(year, 12, 25)),             # Christmas
+    }
+    # New Year's Day on a Saturday is not observed on the previous Friday
+    if date(year, 1, 1).weekday() != 5:
+        holidays.add(_observed(date(year, 1, 1)))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return frozenset(holidays)
+
+
+@lru_cache(maxsize=None)
+def cme_holidays(year):
+    """CME Globex full-day closures for a year (other US holidays are shortened sessions, still traded)."""
+    holidays = {_easter(year) - timedelta(days=2), _observed(date(year, 12, 25))}
+    if date(year, 1, 1).weekday() != 5:
+        holidays.add(_observed(date(year, 1, 1)))
+    return frozenset(holidays)
+
+
+HOLIDAY_RULES = {"nyse": nyse_holidays, "cme": cme_holidays}
+
+
+@dataclass(frozen=True)
+class SessionCalendar:
+    """Regular trading session of one instrument class.
+
+    Local exchange time is shifted by roll_hours to get the trading date (CME Globex's 17:00 CT open
+    belongs to the next day's session); the session is [open_minute, close_minute) of that shifted day.
+    """
+    name: str
+    tz: str
+    open_minute: int
+    close_minute: int
+    roll_hours: int = 0
+    weekdays: tuple = (0, 1, 2, 3, 4)
+    holiday_rule: str = None
+
+    def holiday_ordinals(self, years):
+        """Trading-day ordinals of full closures in the given years."""
+        if self.holiday_rule is None:
+            return np.array([], dtype=np.int32)
+        rule = HOLIDAY_RULES[self.holiday_rule]
+        return np.array(sorted(day_ordinal(d) for year in years for d in rule(year)), dtype=np.int32)
+
+    def session_bounds(self, trading_day):
+        """UTC start and end of the regular session on a trading-day ordinal (None when it is not a trading day)."""
+        day = ordinal_day(trading_day)
+        if day.weekday() not in self.weekdays or trading_day in self.holiday_ordinals([day.year]):
+            return None
+        midnight = pd.Timestamp(day) - pd.Timedelta(hours=self.roll_hours)
+        start = (midnight + pd.Timedelta(minutes=self.open_minute)).tz_localize(self.tz, ambiguous=False, nonexistent="shift_forward")
+        end = (midnight + pd.Timedelta(minutes=self.close_minute)).tz_localize(self.tz, ambiguous=False, nonexistent="shift_forward")
+        return start.tz_convert("UTC"), end.tz_convert("UTC")
+
+
+# CME Globex: Sunday-Friday 17:00-16:00 Chicago time with a daily one-hour break
+_GLOBEX = dict(tz="America/Chicago", open_minute=0, close_minute=23 * 60, roll_hours=7, holiday_rule="cme")
+
+CALENDARS = {
+    "fx": SessionCalendar("fx", **_GLOBEX),
+    "metals": SessionCalendar("metals", **_GLOBEX),
+    "energy": SessionCalendar("energy", **_GLOBEX),
+    "futures": SessionCalendar("futures", **_GLOBEX),
+    "crypto": SessionCalendar("crypto", tz="UTC", open_minute=0, close_minute=24 * 60, weekdays=tuple(range(7))),
+    # ETFs and cash indices: NYSE regular session 09:30-16:00 New York time
+    "equity_etf": SessionCalendar("equity_etf", tz="America/New_York", open_minute=9 * 60 + 30, close_minute=16 * 60, holiday_rule="nyse"),
+}
+
+
+def session_index(utc_times, calendar, display_offset_hours=3):
+    """Precomputes the per-bar session index for bar start times (tz-aware, any zone).
+
+    Returns a DataFrame aligned with the input with integer columns: trading_day (exchange trading date
+    as a day ordinal), session_mask (IN_SESSION and SESSION_WINDOWS bits), and day_gmt3 / hour_gmt3 (the
+    display date ordinal and hour at the given UTC offset).
+    """
+    times = pd.DatetimeIndex(utc_times).tz_convert("UTC")
+    local = times.tz_convert(calendar.tz).tz_localize(None) + pd.Timedelta(hours=calendar.roll_hours)
+    trading_day = local.values.astype("datetime64[D]").astype(np.int64).astype(np.int32)
+    minute = np.asarray(local.hour * 60 + local.minute)
+    # 1970-01-01 was a Thursday (weekday 3)
+    weekday = (trading_day + 3) % 7
+    years = range(local.year.min(), local.year.max() + 1) if len(local) else []
+    trading = np.isin(weekday, calendar.weekdays) & ~np.isin(trading_day, calendar.holiday_ordinals(years))
+    mask = (trading & (minute >= calendar.open_minute) & (minute < calendar.close_minute)).astype(np.uint8) * IN_SESSION
+
+    for bit, tz, start_hour, hours in SESSION_WINDOWS.values():
+        window_local = times.tz_convert(tz)
+        window_minute = np.asarray(window_local.hour * 60 + window_local.minute)
+        mask |= ((window_minute >= start_hour * 60) & (window_minute < (start_hour + hours) * 60)).astype(np.uint8) * bit
+
+    display = times.tz_localize(None) + pd.Timedelta(hours=display_offset_hours)
+    return pd.DataFrame({
+        "trading_day": trading_day,
+        "session_mask": mask,
+        "day_gmt3": display.values.astype("datetime64[D]").astype(np.int64).astype(np.int32),
+        "hour_gmt3": np.asarray(display.hour, dtype=np.int8),
+    }, index=utc_times.index if isinstance(utc_times, pd.Series) else None)
+
+
+def scheduled_display_hours(calendar, trading_day, display_offset_hours=3):
+    """First and last display hours (at the UTC offset) holding a bar of the regular session; None off session.
+
+    Meant for sessions that fall within one display day, such as the NYSE session for ETFs.
+    """
+    bounds = calendar.session_bounds(trading_day)
+    if bounds is None:
+        return None
+    start, end = (t.tz_localize(None) + pd.Timedelta(hours=display_offset_hours) for t in bounds)
+    return start.hour, (end - pd.Timedelta(minutes=1)).hour
@@ -1,74 +1,15 @@
 import streamlit as st
 import pandas as pd
-from yahooquery import Ticker
-from datetime import timedelta, datetime
-import json
-
-# Ticker and ETF maps (from update_rvol.py)
-TICKER_MAP = {
-    "GOLD - COMMODITY EXCHANGE INC.": "GC=F",
-    "EURO FX - CHICAGO MERCANTILE EXCHANGE": "6E=F",
-    "AUSTRALIAN DOLLAR - CHICAGO MERCANTILE EXCHANGE": "6A=F",
-    "BITCOIN - CHICAGO MERCANTILE EXCHANGE": "BTC-USD",
-    "MICRO BITCOIN - CHICAGO MERCANTILE EXCHANGE": "MBT=F",
-    "MICRO ETHER - CHICAGO MERCANTILE EXCHANGE": "ETH-USD",
-    "SILVER - COMMODITY EXCHANGE INC.": "SI=F",
-    "WTI FINANCIAL CRUDE OIL - NEW YORK MERCANTILE EXCHANGE": "CL=F",
-    "JAPANESE YEN - CHICAGO MERCANTILE EXCHANGE": "6J=F",
-    "CANADIAN DOLLAR - CHICAGO MERCANTILE EXCHANGE": "6C=F",
-    "BRITISH POUND - CHICAGO MERCANTILE EXCHANGE": "6B=F",
-    "U.S. DOLLAR INDEX - ICE FUTURES U.S.": "DX-Y.NYB",
-    "NEW ZEALAND DOLLAR - CHICAGO MERCANTILE EXCHANGE": "6N=F",
-    "SWISS FRANC - CHICAGO MERCANTILE EXCHANGE": "6S=F",
-    "DOW JONES U.S. REAL ESTATE IDX - CHICAGO BOARD OF TRADE": "^DJI",
-    "E-MINI S&P 500 STOCK INDEX - CHICAGO MERCANTILE EXCHANGE": "ES=F",
-    "NASDAQ-100 STOCK INDEX (MINI) - CHICAGO MERCANTILE EXCHANGE": "NQ=F",
-    "NIKKEI STOCK AVERAGE - CHICAGO MERCANTILE EXCHANGE": "^N225",
-    "SPDR S&P 500 ETF TRUST": "SPY"
-}
-ETF_MAP = {
-    "GC=F": ("GLD", "SPDR Gold Trust"),
-    "SI=F": ("SLV", "iShares Silver Trust"),
-    "CL=F": ("USO", "United States Oil Fund"),
-    "6E=F": ("FXE", "Invesco CurrencyShares Euro"),
-    "6A=F": ("FXA", "Invesco CurrencyShares AUD"),
-    "6J=F": ("FXY", "Invesco CurrencyShares JPY"),
-    "6C=F": ("FXC", "Invesco CurrencyShares CAD"),
-    "6B=F": ("FXB", "Invesco CurrencyShares GBP"),
-    "6N=F": ("FXA", "Invesco CurrencyShares AUD"),
-    "6S=F": ("FXF", "Invesco CurrencyShares CHF"),
-    "DX-Y.NYB": ("UUP", "Invesco DB US Dollar Bullish"),
-    "BTC-USD": ("BITO", "ProShares Bitcoin Strategy ETF"),
-    "MBT=F": ("BITO", "ProShares Bitcoin Strategy ETF"),
-    "ETH-USD": ("ETHE", "Grayscale Ethereum Trust"),
-    "^DJI": ("IYR", "iShares U.S. Real Estate ETF"),
-    "ES=F": ("SPY", "SPDR S&P 500 ETF Trust"),
-    "NQ=F": ("QQQ", "Invesco QQQ Trust"),
-    "^N225": ("EWJ", "iShares MSCI Japan ETF"),
-    "SPY": ("SPY", "SPDR S&P 500 ETF Trust"),
-}
-
-DAYS = 730  # 2 years
-ROLLING_WINDOW = 120
-
-# Remove ^N225 and DX-Y.NYB from TICKER_MAP and ETF_MAP
-TICKER_MAP = {k: v for k, v in TICKER_MAP.items() if v not in ["^N225", "DX-Y.NYB"]}
-ETF_MAP = {k: v for k, v in ETF_MAP.items() if k not in ["^N225", "DX-Y.NYB"] and v[0] not in ["^N225", "DX-Y.NYB"]}
-
-# All unique asset and ETF symbols
-symbols = list(set(TICKER_MAP.values()) | set(v[0] for v in ETF_MAP.values()))
-
-# Separate asset and ETF symbols
-asset_symbols = [v for v in TICKER_MAP.values() if v not in [etf[0] for etf in ETF_MAP.values()]]
-etf_symbols = list(set(v[0] for v in ETF_MAP.values()))
-
-# Load sector mapping from asset_category_map.json
-with open("asset_category_map.json", "r") as f:
-    ASSET_CATEGORY_MAP = json.load(f)
-# Build a reverse mapping: asset -> sector
-ASSET_TO_SECTOR = {asset: sector for sector, assets in ASSET_CATEGORY_MAP.items() for asset in assets}
-# Build a reverse mapping: ticker -> name
-TICKER_TO_NAME = {v: k for k, v in TICKER_MAP.items()}
+from rvol_analysis import (
+    ETF_MAP, ASSET_CATEGORY_MAP, ASSET_TO_SECTOR, TICKER_TO_NAME, asset_symbols, etf_symbols,
+    load_rvol_data, prefetch_rvol_histories, MARKET_OPEN_WINDOWS, GAP_FEATURES, RVOL_FEATURES, SECTOR_FEATURES, RVOL_PERCENTILE, SECTOR_SCORE_PERCENTILE,
+    prepare_rvol_frame, latest_day_frame, build_rvol_feature_matrix, raw_bars_nodes, rvol_percentile_index_node, sector_score_node,
+    rvol_panel, RVOL_CORRELATION_HOURS, RVOL_CLUSTER_CORRELATION,
+)
+from screener import F, parse_screen, evaluate_screen
+from compute_graph import get_compute_graph
+from comovement import RollingCorrelation, updated_correlation, top_peers, correlation_clusters, format_peers
+from rvol_charts import rvol_day_figure, sector_day_figure, rvol_history_figure, compact_grid_figure
 
 st.title("RVol Monitor")
 if st.button("Rerun"):
@@ -78,265 +19,190 @@ if st.button("Rerun"):
 st.sidebar.header("Gap Up RVol Filter")
 market_open = st.sidebar.selectbox(
     "Select Market Open Window:",
-    ["London (10:00-11:00)", "NY (16:00-17:00)", "Asian (3:00-4:00)"]
+    list(MARKET_OPEN_WINDOWS)
 )
 gap_threshold = st.sidebar.number_input(
     "Gap Up Threshold (ratio, e.g. 1.5 = 50% higher)", min_value=1.0, max_value=10.0, value=1.5, step=0.1
 )
+extra_screen = st.sidebar.text_input(
+    "Additional screen (optional, AND-ed with gap up)",
+    placeholder="rvol_percentile >= 70 and not sector_score < sector_score_threshold",
+    help="Features: " + ", ".join(GAP_FEATURES + RVOL_FEATURES + SECTOR_FEATURES) + ". Combine with and / or / not."
+)
 
-# Determine which hours to use for market open
-if market_open.startswith("London"):
-    open_hours = [10, 11]
-elif market_open.startswith("NY"):
-    open_hours = [16, 17]
-elif market_open.startswith("Asian"):
-    open_hours = [3, 4]
-else:
-    open_hours = [16, 17]
+st.sidebar.header("Charts")
+chart_layout = st.sidebar.radio("Chart layout", ["Per asset", "Compact grid"], horizontal=True,
+                                help="Compact grid draws every passing asset in one WebGL figure.")
+show_history = st.sidebar.checkbox("Show 2-year rvol history (downsampled)")
 
-def detect_gap_up(df, open_hours, threshold):
-    if df.empty:
-        return False, None, None
-    df = df.copy()
-    df["datetime_gmt3_dt"] = pd.to_datetime(df["datetime_gmt3"], errors="coerce")
-    df = df.dropna(subset=["datetime_gmt3_dt"])
-    df = df.sort_values("datetime_gmt3_dt", ascending=False)
-    df["date_gmt3"] = df["datetime_gmt3_dt"].dt.date
-    df["hour_gmt3"] = df["datetime_gmt3_dt"].dt.hour
-    if df.empty:
-        return False, None, None
-    latest_day = df.iloc[0]["date_gmt3"]
-    prev_day = latest_day - pd.Timedelta(days=1)
-    # Get rvol for open hours for both days
-    curr_open = df[(df["date_gmt3"] == latest_day) & (df["hour_gmt3"].isin(open_hours))]["rvol"]
-    prev_open = df[(df["date_gmt3"] == prev_day) & (df["hour_gmt3"].isin(open_hours))]["rvol"]
-    if curr_open.empty or prev_open.empty:
-        return False, None, None
-    curr_mean = curr_open.mean()
-    prev_mean = prev_open.mean()
-    if prev_mean == 0 or pd.isna(prev_mean):
-        return False, curr_mean, prev_mean
-    gap_ratio = curr_mean / prev_mean
-    print(f"Asian Open Debug: curr_open={curr_open}, prev_open={prev_open}, curr_mean={curr_mean}, prev_mean={prev_mean}, gap_ratio={gap_ratio}")
-    return gap_ratio >= threshold, curr_mean, prev_mean
+st.sidebar.header("Percentile Lines")
+rvol_percentile = st.sidebar.slider("RVol percentile (2y)", min_value=1, max_value=99, value=RVOL_PERCENTILE)
+sector_percentile = st.sidebar.slider("Sector score percentile (2y)", min_value=1, max_value=99, value=SECTOR_SCORE_PERCENTILE)
 
+# Determine which session window to use for market open
+open_window = MARKET_OPEN_WINDOWS.get(market_open, "NY")
+
+# Failed downloads raise, and Streamlit does not cache exceptions, so a failed symbol is retried on the next rerun
 @st.cache_data(show_spinner=True)
 def fetch_rvol_data(symbol):
-    t = Ticker(symbol, timeout=60)
-    hist = t.history(period=f"{DAYS}d", interval="1h")
-    if isinstance(hist, pd.DataFrame) and not hist.empty:
-        if isinstance(hist.index, pd.MultiIndex):
-            hist = hist.reset_index()
-        hist = hist.rename(columns={"symbol": "ticker"})
-        hist = hist.dropna(subset=["volume", "date"])
-        hist = hist[hist["volume"] > 0]
-        hist["datetime"] = pd.to_datetime(hist["date"], errors="coerce", utc=True)
-        hist = hist.dropna(subset=["datetime"])
-        hist = hist.sort_values("datetime")
-        # Convert to GMT+3
-        hist["datetime_gmt3"] = hist["datetime"] + timedelta(hours=3)
-        hist["datetime_gmt3"] = hist["datetime_gmt3"].dt.strftime("%Y-%m-%dT%H:%M:%S+03:00")
-        # Calculate avg_volume and rvol
-        hist["avg_volume"] = hist["volume"].rolling(ROLLING_WINDOW).mean()
-        hist["rvol"] = hist["volume"] / hist["avg_volume"]
-        return hist
-    else:
+    return load_rvol_data(symbol)
+
+def load_bars(symbol):
+    """fetch_rvol_data that reports a failed symbol in the sidebar instead of failing the page."""
+    try:
+        return fetch_rvol_data(symbol)
+    except Exception as e:
+        st.sidebar.warning(f"No data for {symbol}: {e}")
         return pd.DataFrame()
 
 # Fetch ETF data in the background (not displayed)
 @st.cache_data(show_spinner=False)
 def fetch_all_etf_data():
-    etf_data = {}
-    for symbol in etf_symbols:
-        etf_data[symbol] = fetch_rvol_data(symbol)
-    return etf_data
+    prefetch_rvol_histories(etf_symbols)
+
+# Asset and sector histories are downloaded in parallel once, ahead of the per-asset loop
+@st.cache_data(show_spinner=False)
+def prefetch_asset_data():
+    prefetch_rvol_histories(set(asset_symbols) | {a for assets in ASSET_CATEGORY_MAP.values() for a in assets})
 
 # Trigger ETF data fetch in the background
-_ = fetch_all_etf_data()
+fetch_all_etf_data()
+prefetch_asset_data()
 
-# Display all assets with gap up filter
-for symbol in asset_symbols:
+# Results are memoized per node by input content across reruns: a widget change only recomputes the nodes it feeds
+graph = get_compute_graph()
+bars = raw_bars_nodes(graph, load_bars)
+# 2-year rvol and sector score series are sorted once per data refresh; slider changes are index lookups
+percentile_index = rvol_percentile_index_node(graph, asset_symbols, bars, ETF_MAP, ASSET_TO_SECTOR, ASSET_CATEGORY_MAP)
+
+# Cross-asset rvol co-movement over the whole universe; the tracker keeps its running sums across reruns
+# and sessions, and only appends the hours that are new since the last data refresh
+correlation_universe = sorted(set(asset_symbols) | {a for assets in ASSET_CATEGORY_MAP.values() for a in assets} | set(etf_symbols))
+
+@st.cache_resource(show_spinner=False)
+def get_rvol_correlation(symbols):
+    # The last two hours are revised on the next refresh: the current bar is partial, and an ETF's :30 bar
+    # for the previous hour can print after the futures' next bar
+    return RollingCorrelation(symbols, RVOL_CORRELATION_HOURS, revise_rows=2)
+
+rvol_tracker = get_rvol_correlation(tuple(correlation_universe))
+rvol_hourly = graph.node("rvol_panel", rvol_panel, {s: bars(s) for s in correlation_universe})
+rvol_corr = graph.node("rvol_correlation", lambda panel: updated_correlation(rvol_tracker, panel), rvol_hourly)
+rvol_clusters = graph.node("rvol_clusters", correlation_clusters, rvol_corr, RVOL_CLUSTER_CORRELATION).value
+
+# Screen the whole universe at once: gap up AND the optional user condition
+screen = F("gap_ratio") >= gap_threshold
+if extra_screen.strip():
+    try:
+        screen = screen & parse_screen(extra_screen)
+    except (ValueError, KeyError) as e:
+        st.sidebar.error(f"Ignoring additional screen: {e}")
+features = build_rvol_feature_matrix(
+    asset_symbols, fetch_rvol_data, open_window, features=screen.features(),
+    etf_map=ETF_MAP, asset_to_sector=ASSET_TO_SECTOR, asset_category_map=ASSET_CATEGORY_MAP,
+    rvol_percentile=rvol_percentile, sector_percentile=sector_percentile, percentile_index=percentile_index, graph=graph, bars=bars
+)
+feature_matrix = graph.source("rvol_features", features)
+try:
+    passing = graph.node("rvol_screen", evaluate_screen, feature_matrix, screen).value
+except KeyError as e:
+    st.sidebar.error(f"Ignoring additional screen: {e}")
+    passing = graph.node("rvol_screen", evaluate_screen, feature_matrix, F("gap_ratio") >= gap_threshold).value
+
+with st.sidebar.expander(f"Co-movement clusters (rvol, {RVOL_CORRELATION_HOURS // 24}d)"):
+    for cluster in [c for c in rvol_clusters if len(c) > 1]:
+        st.write(", ".join(cluster))
+
+with st.sidebar.expander("Computation cache"):
+    st.dataframe(graph.node_stats().round(3))
+
+# Figures are graph nodes keyed by (symbol, day, percentile) and their input data, so reruns reuse them
+def rvol_day_chart(symbol, latest_day, day_df, rvol_line):
     asset_name = TICKER_TO_NAME.get(symbol, symbol)
-    df = fetch_rvol_data(symbol)
-    # Gap up detection
-    is_gap, curr_open_rvol, prev_open_rvol = detect_gap_up(df, open_hours, gap_threshold)
-    if not is_gap:
-        continue  # Skip assets that do not meet the gap up threshold
-    st.subheader(f"{asset_name} ({symbol})")
-    st.caption(f"Gap up detected: Current open rvol = {curr_open_rvol:.2f}, Previous open rvol = {prev_open_rvol:.2f}, Ratio = {curr_open_rvol/prev_open_rvol:.2f}")
+    chart_df = day_df.set_index("hour_gmt3")[["rvol"]].sort_index()
+    return rvol_day_figure(f"{asset_name} ({symbol}) — {latest_day}", chart_df.index, chart_df["rvol"], rvol_line, rvol_percentile)
+
+def sector_day_chart(sector_result, latest_day):
+    sector_chart_df = sector_result["scores"].set_index("hour_gmt3")[["sector_score"]].sort_index()
+    title = f"Sector Score — {sector_result['sector']} ({sector_result['etf_symbol']}) — {latest_day}"
+    return sector_day_figure(title, sector_chart_df.index, sector_chart_df["sector_score"], sector_result["threshold"], sector_percentile)
+
+def rvol_history_chart(symbol, df, rvol_line):
+    history = df.iloc[::-1].dropna(subset=["rvol"])
+    title = f"{TICKER_TO_NAME.get(symbol, symbol)} ({symbol}) — 2-year rvol"
+    return rvol_history_figure(title, history["datetime_gmt3_dt"].to_numpy(), history["rvol"].to_numpy(), rvol_line, rvol_percentile)
+
+def grid_panel(symbol, latest_day, day_df, rvol_line, sector_result):
+    chart_df = day_df.set_index("hour_gmt3")["rvol"].sort_index()
+    panel = {"title": f"{symbol} — {latest_day}", "hours": chart_df.index.to_numpy(), "rvol": chart_df.to_numpy(), "rvol_line": rvol_line}
+    if not sector_result["warning"]:
+        scores = sector_result["scores"].set_index("hour_gmt3")["sector_score"].sort_index()
+        panel.update(sector_title=f"{sector_result['sector']} ({sector_result['etf_symbol']})", sector_hours=scores.index.to_numpy(),
+                     sector_scores=scores.to_numpy(), sector_line=sector_result["threshold"])
+    return panel
+
+# Display all assets that pass the screen
+grid_panels = []
+for symbol in features.index[passing.to_numpy()]:
+    asset_name = TICKER_TO_NAME.get(symbol, symbol)
+    df = bars(symbol).value
+    curr_open_rvol = features.at[symbol, "curr_open_rvol"]
+    prev_open_rvol = features.at[symbol, "prev_open_rvol"]
+    if chart_layout == "Per asset":
+        st.subheader(f"{asset_name} ({symbol})")
+        st.caption(f"Gap up detected: Current open rvol = {curr_open_rvol:.2f}, Previous open rvol = {prev_open_rvol:.2f}, Ratio = {curr_open_rvol/prev_open_rvol:.2f}")
+        peers = top_peers(rvol_corr.value, symbol)
+        if not peers.empty:
+            st.caption(f"Top co-moving (rvol, {RVOL_CORRELATION_HOURS // 24}d): {format_peers(peers)}")
     if df.empty:
         st.warning(f"No data found for {asset_name} ({symbol}).")
     else:
-        # Convert datetime_gmt3 back to datetime for filtering
-        df["datetime_gmt3_dt"] = pd.to_datetime(df["datetime_gmt3"], errors="coerce")
-        df = df.dropna(subset=["datetime_gmt3_dt"])
-        df = df.sort_values("datetime_gmt3_dt", ascending=False)
-        df["date_gmt3"] = df["datetime_gmt3_dt"].dt.date
-        df["hour_gmt3"] = df["datetime_gmt3_dt"].dt.hour
+        # GMT+3 datetime, date and hour columns for filtering
+        prepared = graph.node("prepared_frame", prepare_rvol_frame, bars(symbol))
+        df = prepared.value
         # Isolate the latest available date (even if partial)
         if df.empty:
             st.warning(f"No valid datetime data for {asset_name} ({symbol}).")
         else:
-            latest_day = df.iloc[0]["date_gmt3"]
-            day_df = df[df["date_gmt3"] == latest_day].copy()
-            # Only keep hours between 0 and 23
-            day_df = day_df[(day_df["hour_gmt3"] >= 0) & (day_df["hour_gmt3"] <= 23)]
+            latest_day, day_df = latest_day_frame(df)
             if day_df.empty:
                 st.warning(f"No data for {asset_name} ({symbol}) on latest day (hours 0-23).")
             else:
-                # 70th percentile line from 2 years of rvol
-                percentile_70 = df["rvol"].quantile(0.7)
+                # Percentile line from 2 years of rvol
+                rvol_line = percentile_index.value.percentile(("rvol", symbol), rvol_percentile)
+                sector_node = sector_score_node(graph, symbol, latest_day, bars, ETF_MAP, ASSET_TO_SECTOR, ASSET_CATEGORY_MAP, sector_percentile, percentile_index)
+                sector_result = sector_node.value
+                if chart_layout == "Compact grid":
+                    grid_panels.append(graph.node("rvol_grid_panel", lambda s, d, p, line, sector: grid_panel(s, d, latest_day_frame(p)[1], line, sector),
+                                                  symbol, latest_day, prepared, rvol_line, sector_node).value)
+                    if sector_result["warning"]:
+                        st.warning(f"{asset_name}: {sector_result['warning']}")
+                    continue
+
                 # Plot the latest day (partial or full)
-                chart_df = day_df.set_index("hour_gmt3")[["rvol"]].sort_index()
-                import plotly.graph_objs as go
-                fig = go.Figure()
-                fig.add_trace(go.Bar(x=chart_df.index, y=chart_df["rvol"], name="RVol", marker_color="blue"))
-                fig.add_hline(y=percentile_70, line_width=3, line_dash="dash", line_color="red", annotation_text="70th percentile", annotation_position="top right")
-                fig.update_layout(
-                    title=f"{asset_name} ({symbol}) — {latest_day}",
-                    xaxis_title="Hour of Day (GMT+3)",
-                    yaxis_title="RVol",
-                    xaxis=dict(tickmode='array', tickvals=list(range(24)), ticktext=[str(h) for h in range(24)]),
-                    yaxis=dict(rangemode="tozero"),
-                    height=300
-                )
+                fig = graph.node("rvol_day_chart", lambda s, d, p, line, q: rvol_day_chart(s, d, latest_day_frame(p)[1], line),
+                                 symbol, latest_day, prepared, rvol_line, rvol_percentile).value
                 st.plotly_chart(fig, use_container_width=True, key=f"rvol-{symbol}")
+                if show_history:
+                    history_fig = graph.node("rvol_history_chart", lambda s, p, line, q: rvol_history_chart(s, p, line),
+                                             symbol, prepared, rvol_line, rvol_percentile).value
+                    st.plotly_chart(history_fig, use_container_width=True, key=f"history-{symbol}")
 
                 # --- Sector Score Chart ---
-                # Find the ETF symbol for this asset
-                etf_info = ETF_MAP.get(symbol)
-                sector = ASSET_TO_SECTOR.get(symbol)
-                if not sector:
-                    st.warning(f"No sector found for {asset_name} ({symbol}) in asset_category_map.json.")
-                elif not etf_info:
-                    st.warning(f"No ETF mapping found for {asset_name} ({symbol}), cannot compute sector score.")
+                if sector_result["warning"]:
+                    st.warning(f"{asset_name}: {sector_result['warning']}")
                 else:
-                    etf_symbol = etf_info[0]
-                    etf_df = fetch_rvol_data(etf_symbol)
-                    if etf_df is None or etf_df.empty:
-                        st.warning(f"No ETF data found for {etf_symbol} (asset ETF for {asset_name} ({symbol})).")
-                    else:
-                        # Prepare ETF data
-                        etf_df = etf_df.copy()
-                        etf_df["datetime_gmt3_dt"] = pd.to_datetime(etf_df["datetime_gmt3"], errors="coerce")
-                        etf_df = etf_df.dropna(subset=["datetime_gmt3_dt"])
-                        etf_df = etf_df.sort_values("datetime_gmt3_dt", ascending=False)
-                        etf_df["date_gmt3"] = etf_df["datetime_gmt3_dt"].dt.date
-                        etf_df["hour_gmt3"] = etf_df["datetime_gmt3_dt"].dt.hour
-                        # Isolate ETF data for the latest day
-                        if etf_df.empty:
-                            st.warning(f"No valid datetime data for ETF {etf_symbol}.")
-                        else:
-                            etf_latest_day = etf_df.iloc[0]["date_gmt3"]
-                            etf_day_df = etf_df[etf_df["date_gmt3"] == etf_latest_day].copy()
-                            etf_hours = sorted(etf_day_df["hour_gmt3"].unique().tolist()) if not etf_day_df.empty else []
-                            # Get previous day's 22:00 rvol for pre-market forward fill
-                            prev_day = etf_latest_day - pd.Timedelta(days=1)
-                            prev_day_df = etf_df[etf_df["date_gmt3"] == prev_day]
-                            prev_22_rvol = None
-                            if not prev_day_df.empty and 22 in prev_day_df["hour_gmt3"].tolist():
-                                prev_22_rvol = prev_day_df[prev_day_df["hour_gmt3"] == 22]["rvol"].iloc[0]
-                            # Forward fill ETF rvol for hours 0-23
-                            etf_ffill = pd.DataFrame({"hour_gmt3": list(range(24))})
-                            etf_ffill = etf_ffill.merge(etf_day_df[["hour_gmt3", "rvol"]], on="hour_gmt3", how="left")
-                            # Fill 0-15 with previous day's 22:00 rvol
-                            if prev_22_rvol is not None:
-                                etf_ffill.loc[etf_ffill["hour_gmt3"] < 16, "rvol"] = prev_22_rvol
-                            # Forward fill 16-22 with actual values, and 23 with 22:00 value
-                            last_rvol = None
-                            for idx, row in etf_ffill.iterrows():
-                                h = row["hour_gmt3"]
-                                if 16 <= h <= 22 and not pd.isna(row["rvol"]):
-                                    last_rvol = row["rvol"]
-                                elif h > 22:
-                                    etf_ffill.at[idx, "rvol"] = last_rvol
-                            # --- Calculate mean sector rvol for each hour ---
-                            sector_assets = ASSET_CATEGORY_MAP[sector]
-                            sector_rvols = []
-                            for asset in sector_assets:
-                                asset_df = fetch_rvol_data(asset)
-                                asset_disp_name = TICKER_TO_NAME.get(asset, asset)
-                                if asset_df is None or asset_df.empty:
-                                    continue
-                                asset_df = asset_df.copy()
-                                asset_df["datetime_gmt3_dt"] = pd.to_datetime(asset_df["datetime_gmt3"], errors="coerce")
-                                asset_df = asset_df.dropna(subset=["datetime_gmt3_dt"])
-                                asset_df = asset_df.sort_values("datetime_gmt3_dt", ascending=False)
-                                asset_df["date_gmt3"] = asset_df["datetime_gmt3_dt"].dt.date
-                                asset_df["hour_gmt3"] = asset_df["datetime_gmt3_dt"].dt.hour
-                                asset_day_df = asset_df[asset_df["date_gmt3"] == latest_day].copy()
-                                asset_day_df = asset_day_df[(asset_day_df["hour_gmt3"] >= 0) & (asset_day_df["hour_gmt3"] <= 23)]
-                                if not asset_day_df.empty:
-                                    sector_rvols.append(asset_day_df.set_index("hour_gmt3")["rvol"])
-                            if not sector_rvols:
-                                st.warning(f"No sector rvol data available for sector {sector} on {latest_day}.")
-                            else:
-                                sector_rvol_mean = pd.concat(sector_rvols, axis=1).mean(axis=1)
-                                # Merge mean sector rvol and ETF rvol on hour_gmt3 for the latest day
-                                merged = pd.merge(
-                                    sector_rvol_mean.rename("sector_rvol").reset_index(),
-                                    etf_ffill[["hour_gmt3", "rvol"]].rename(columns={"rvol": "rvol_etf"}),
-                                    on="hour_gmt3",
-                                    how="inner"
-                                )
-                                if merged.empty:
-                                    st.warning(f"No overlapping hourly data for sector {sector} and ETF {etf_symbol} on {latest_day}.")
-                                else:
-                                    # Calculate sector score for the latest day
-                                    merged["sector_score"] = 0.4 * merged["rvol_etf"] + 0.6 * merged["sector_rvol"]
-                                    # --- Calculate 82nd percentile from 2-year sector score data ---
-                                    # Build 2-year sector score series (all hours, all assets in sector, and ETF)
-                                    sector_rvols_2y = []
-                                    for asset in sector_assets:
-                                        asset_df_2y = fetch_rvol_data(asset)
-                                        if asset_df_2y is None or asset_df_2y.empty:
-                                            continue
-                                        asset_df_2y = asset_df_2y.copy()
-                                        asset_df_2y["datetime_gmt3_dt"] = pd.to_datetime(asset_df_2y["datetime_gmt3"], errors="coerce")
-                                        asset_df_2y = asset_df_2y.dropna(subset=["datetime_gmt3_dt"])
-                                        asset_df_2y = asset_df_2y.sort_values("datetime_gmt3_dt")
-                                        asset_df_2y["hour_gmt3"] = asset_df_2y["datetime_gmt3_dt"].dt.hour
-                                        sector_rvols_2y.append(asset_df_2y["rvol"])
-                                    if sector_rvols_2y:
-                                        sector_rvols_2y_all = pd.concat(sector_rvols_2y, axis=0)
-                                    else:
-                                        sector_rvols_2y_all = pd.Series(dtype=float)
-                                    etf_df_2y = fetch_rvol_data(etf_symbol)
-                                    if etf_df_2y is not None and not etf_df_2y.empty:
-                                        etf_df_2y = etf_df_2y.copy()
-                                        etf_df_2y["datetime_gmt3_dt"] = pd.to_datetime(etf_df_2y["datetime_gmt3"], errors="coerce")
-                                        etf_df_2y = etf_df_2y.dropna(subset=["datetime_gmt3_dt"])
-                                        etf_df_2y = etf_df_2y.sort_values("datetime_gmt3_dt")
-                                        etf_rvol_2y = etf_df_2y["rvol"]
-                                    else:
-                                        etf_rvol_2y = pd.Series(dtype=float)
-                                    # Calculate sector score for all available hours in 2 years
-                                    sector_score_2y = []
-                                    if not sector_rvols_2y_all.empty and not etf_rvol_2y.empty:
-                                        # Align lengths by truncating to the shortest
-                                        min_len = min(len(sector_rvols_2y_all), len(etf_rvol_2y))
-                                        sector_score_2y = 0.4 * etf_rvol_2y.iloc[:min_len].values + 0.6 * sector_rvols_2y_all.iloc[:min_len].values
-                                        sector_score_2y = pd.Series(sector_score_2y)
-                                    elif not sector_rvols_2y_all.empty:
-                                        sector_score_2y = sector_rvols_2y_all
-                                    elif not etf_rvol_2y.empty:
-                                        sector_score_2y = etf_rvol_2y
-                                    else:
-                                        sector_score_2y = pd.Series(dtype=float)
-                                    percentile_82 = sector_score_2y.quantile(0.82) if not sector_score_2y.empty else None
-                                    # Plot sector score for the latest day
-                                    sector_chart_df = merged.set_index("hour_gmt3")[["sector_score"]].sort_index()
-                                    fig2 = go.Figure()
-                                    fig2.add_trace(go.Bar(x=sector_chart_df.index, y=sector_chart_df["sector_score"], name="Sector Score", marker_color="orange"))
-                                    if percentile_82 is not None:
-                                        fig2.add_hline(y=percentile_82, line_width=3, line_dash="dash", line_color="purple", annotation_text="82nd percentile (2y)", annotation_position="top right")
-                                    fig2.update_layout(
-                                        title=f"Sector Score — {sector} ({etf_symbol}) — {latest_day}",
-                                        xaxis_title="Hour of Day (GMT+3)",
-                                        yaxis_title="Sector Score",
-                                        xaxis=dict(tickmode='array', tickvals=list(range(24)), ticktext=[str(h) for h in range(24)]),
-                                        yaxis=dict(rangemode="tozero"),
-                                        height=300
-                                    )
-                                    st.plotly_chart(fig2, use_container_width=True, key=f"sector-{symbol}")
-    st.markdown('---') 
\ No newline at end of file
+                    # Plot sector score for the latest day
+                    fig2 = graph.node("sector_day_chart", lambda sector, d, q: sector_day_chart(sector, d),
+                                      sector_node, latest_day, sector_percentile).value
+                    st.plotly_chart(fig2, use_container_width=True, key=f"sector-{symbol}")
+    if chart_layout == "Per asset":
+        st.markdown('---')
+
+# Compact grid: one WebGL figure for every passing asset instead of two figures each
+if chart_layout == "Compact grid" and grid_panels:
+    passing_features = features.loc[passing.to_numpy(), GAP_FEATURES + RVOL_FEATURES + SECTOR_FEATURES].copy()
+    passing_features["co_moving"] = [format_peers(top_peers(rvol_corr.value, s, 3)) for s in passing_features.index]
+    st.dataframe(passing_features.rename(index=lambda s: f"{TICKER_TO_NAME.get(s, s)} ({s})").round(2))
+    grid = graph.node("rvol_grid_chart", compact_grid_figure, grid_panels, rvol_percentile, sector_percentile).value
+    st.plotly_chart(grid, use_container_width=True, key="rvol-grid")
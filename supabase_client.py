@@ -1,40 +1,92 @@
 import os
-from supabase import create_client, Client
+import logging
+import threading
+import httpx
+from supabase import create_client, Client, ClientOptions
 from dotenv import load_dotenv
 
-def get_supabase_client() -> Client:
-    """Initializes and returns the Supabase client using credentials from environment variables."""
-    print("Attempting to load Supabase credentials from environment/dotenv...")
-    load_dotenv() # Load variables from .env
+# Credentials and the settings below may live in .env, so it is loaded before anything is read
+load_dotenv()
+
+# HTTP settings for the shared client (seconds / connection counts); request concurrency is budgeted by fetch_scheduler
+SUPABASE_TIMEOUT = float(os.environ.get("SUPABASE_TIMEOUT", 30))
+SUPABASE_MAX_CONNECTIONS = int(os.environ.get("SUPABASE_MAX_CONNECTIONS", 10))
+SUPABASE_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("SUPABASE_MAX_KEEPALIVE_CONNECTIONS", 10))
+SUPABASE_KEEPALIVE_EXPIRY = float(os.environ.get("SUPABASE_KEEPALIVE_EXPIRY", 60))
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def build_client_options(timeout=SUPABASE_TIMEOUT, max_connections=SUPABASE_MAX_CONNECTIONS,
+                         max_keepalive_connections=SUPABASE_MAX_KEEPALIVE_CONNECTIONS, keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY) -> ClientOptions:
+    """Builds client options backed by one pooled keep-alive HTTP client."""
+    http_client = httpx.Client(
+        timeout=timeout,
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections, keepalive_expiry=keepalive_expiry),
+    )
+    try:
+        return ClientOptions(postgrest_client_timeout=timeout, httpx_client=http_client)
+    except TypeError:
+        # Older supabase-py without httpx_client: the PostgREST session still keeps its own connections alive
+        http_client.close()
+        return ClientOptions(postgrest_client_timeout=timeout)
+
 
+def get_shared_supabase_client() -> Client:
+    """Returns the process-wide Supabase client, creating it once and reusing its pooled connections afterwards."""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                _shared_client = get_supabase_client(options=build_client_options())
+    return _shared_client
+
+
+def set_supabase_client(client) -> None:
+    """Injects a client (e.g. a fake for offline tests) to be returned by get_shared_supabase_client."""
+    global _shared_client
+    with _shared_client_lock:
+        _shared_client = client
+
+
+def reset_supabase_client() -> None:
+    """Drops the shared client so the next call builds a fresh one."""
+    set_supabase_client(None)
+
+
+def get_supabase_client(options: ClientOptions = None) -> Client:
+    """Initializes and returns the Supabase client using credentials from environment variables."""
+    logging.info("Attempting to load Supabase credentials from environment/dotenv...")
     url: str = os.environ.get("SUPABASE_URL")
     key: str = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
 
     if not url or not key:
-        print("Error: SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set in environment or .env file.")
+        logging.error("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set in environment or .env file.")
         # Check if placeholders are still present
         if os.environ.get("SUPABASE_URL") == "YOUR_SUPABASE_PROJECT_URL" or os.environ.get("SUPABASE_SERVICE_ROLE_KEY") == "YOUR_SUPABASE_SERVICE_ROLE_KEY":
-             print("Error: Please replace placeholder values in your .env file with actual Supabase credentials.")
+             logging.error("Please replace placeholder values in your .env file with actual Supabase credentials.")
 
         raise ValueError("Supabase URL and Service Role Key must be set.")
 
-    print("Supabase credentials loaded. Initializing client...")
+    logging.info("Supabase credentials loaded. Initializing client...")
     try:
         # Use the service_role key for operations that require bypassing RLS (like inserts)
-        supabase: Client = create_client(url, key)
-        print("Supabase client initialized successfully.")
+        supabase: Client = create_client(url, key, options=options) if options else create_client(url, key)
+        logging.info("Supabase client initialized successfully.")
         return supabase
     except Exception as e:
-        print(f"Error initializing Supabase client: {e}")
+        logging.error(f"Error initializing Supabase client: {e}")
         return None
 
 # Example usage (can be removed or kept for testing)
 if __name__ == "__main__":
     print("--- Testing Supabase Client Initialization ---")
     try:
-        supabase_client = get_supabase_client()
+        supabase_client = get_shared_supabase_client()
         if supabase_client:
             print("Client initialization test successful.")
+            print(f"Shared client reused: {get_shared_supabase_client() is supabase_client}")
             # You could add a test query here if needed, e.g.,
             # try:
             #     response = supabase_client.table("cot_reports").select("*").limit(1).execute()
@@ -0,0 +1,57 @@
+"""End-to-end replay over date-typed daily bars and report dates (offline: Yahoo and COT fetches are faked)."""
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+import prototype_1
+import replay
+
+SYMBOLS = {"GOLD - COMMODITY EXCHANGE INC.": "GC=F", "SILVER - COMMODITY EXCHANGE INC.": "SI=F"}
+LAST_DAY = date(2026, 10, 16)
+
+
+class DailyTicker:
+    """yahooquery.Ticker stand-in returning daily bars indexed by datetime.date, as yahooquery does."""
+
+    def __init__(self, symbol, **kwargs):
+        self.symbol = symbol
+
+    def history(self, start=None, end=None, interval="1d"):
+        rng = np.random.default_rng(sum(map(ord, self.symbol)))
+        days = [LAST_DAY - timedelta(days=i) for i in range(729, -1, -1)]
+        close = 100 + np.cumsum(rng.normal(0, 1, len(days)))
+        return pd.DataFrame({
+            "symbol": self.symbol, "date": days, "open": close, "high": close + 1, "low": close - 1,
+            "close": close, "volume": rng.integers(100, 1000, len(days)).astype(float),
+        }).set_index(["symbol", "date"])
+
+
+def cot_reports(asset_name, limit=5):
+    """Weekly reports with date report_date values reaching back before the first bar."""
+    rng = np.random.default_rng(len(asset_name))
+    return [
+        {"report_date": LAST_DAY - timedelta(weeks=i), **{
+            f"{category}_positions_{side}_all": float(rng.integers(1000, 5000))
+            for category in prototype_1.TRADER_CATEGORIES for side in ("long", "short")
+        }}
+        for i in range(limit)
+    ]
+
+
+def test_replay_with_date_typed_bars_and_reports(monkeypatch):
+    monkeypatch.setattr(prototype_1, "Ticker", DailyTicker)
+    monkeypatch.setattr(prototype_1, "TICKER_MAP", SYMBOLS)
+    monkeypatch.setattr(prototype_1, "fetch_cot_reports", cot_reports)
+    prototype_1.get_scheduler().invalidate("yahoo")
+
+    combined, cot_changes = prototype_1.run_multi_asset_analysis(days=730, cot_limit=156, return_cot_changes=True)
+    events, summary = replay.run_replay(combined, cot_changes=cot_changes)
+
+    assert len(cot_changes) == 2 * 155
+    assert events["signal"].str.startswith("cot_").any()
+    assert events["fire_date"].dtype == "datetime64[ns]"
+    # Warm-up reports before the first bar do not fire, but feed the thresholds of the first events
+    first_bar = replay._naive(combined["datetime"]).min()
+    assert (events["fire_date"] >= first_bar).all()
+    assert set(summary.index) == set(events["signal"])